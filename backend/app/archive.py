@@ -0,0 +1,405 @@
+"""Retention and archival for impact logs.
+
+Logs from whole calendar months older than ARCHIVE_AFTER_DAYS are
+  1. exported to ARCHIVE_DIR/impact_logs/YYYY-MM/<bucket>.ndjson.gz (Extended
+     JSON, one document per line, created_at order). Users are hashed into
+     ARCHIVE_BUCKETS files per month so one user's export reads one file,
+     not the whole month,
+  2. rolled up into one `impact_log_summaries` document per user and month,
+  3. deleted from Mongo in throttled batches.
+Progress per month is recorded in `archive_runs`, so an interrupted run picks
+up where it stopped. The job runs in the API when ARCHIVE_ENABLED=true (one
+worker at a time, guarded by a lease) or manually with `python -m app.archive`.
+
+With IMPACT_LOGS_STORAGE=timeseries the delete step needs MongoDB 7.0+.
+"""
+from bson import json_util
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+import hashlib
+import heapq
+from pymongo.errors import DuplicateKeyError
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Set
+import asyncio
+import gzip
+import json
+import os
+import shutil
+import uuid
+
+from app.database import get_database, IMPACT_LOGS_COLLECTION
+
+ARCHIVE_ENABLED = os.getenv("ARCHIVE_ENABLED", "false").lower() == "true"
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+ARCHIVE_INTERVAL_HOURS = float(os.getenv("ARCHIVE_INTERVAL_HOURS", "24"))
+ARCHIVE_DELETE_BATCH = int(os.getenv("ARCHIVE_DELETE_BATCH", "1000"))
+ARCHIVE_DELETE_PAUSE_MS = float(os.getenv("ARCHIVE_DELETE_PAUSE_MS", "50"))
+# Only applies to months archived from now on; each month records its own count
+ARCHIVE_BUCKETS = int(os.getenv("ARCHIVE_BUCKETS", "64"))
+ARCHIVE_LEASE_MINUTES = 30
+
+SCORE_FIELDS = ["carbon_score", "water_score", "energy_score", "waste_score"]
+JSON_OPTIONS = json_util.RELAXED_JSON_OPTIONS
+# Naive UTC datetimes on read, matching what Motor returns for live logs
+LOAD_JSON_OPTIONS = JSON_OPTIONS.with_options(tz_aware=False)
+ARCHIVE_READ_BATCH = 500
+
+class LeaseLost(Exception):
+    """Another worker took over the archival lease"""
+
+def month_key(moment: datetime) -> str:
+    return moment.strftime("%Y-%m")
+
+def month_bounds(month: str):
+    start = datetime.strptime(month, "%Y-%m")
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+def user_bucket(user_id: str, buckets: int) -> int:
+    return int(hashlib.sha1(str(user_id).encode("utf-8")).hexdigest()[:8], 16) % buckets
+
+def archive_dir(month: str) -> str:
+    return os.path.join(ARCHIVE_DIR, "impact_logs", month)
+
+def archive_path(month: str, bucket: int) -> str:
+    return os.path.join(archive_dir(month), f"{bucket:03d}.ndjson.gz")
+
+def to_naive_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    """Normalise an API datetime to the naive UTC values stored in Mongo"""
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+def archive_cutoff(now: Optional[datetime] = None) -> datetime:
+    """Start of the month containing now - ARCHIVE_AFTER_DAYS; only earlier months are archived"""
+    threshold = (now or datetime.utcnow()) - timedelta(days=ARCHIVE_AFTER_DAYS)
+    return threshold.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def build_summary_pipeline(start: datetime, end: datetime, month: str) -> List[Dict]:
+    sums = {f"sum_{field}": {"$sum": f"${field}"} for field in SCORE_FIELDS}
+    return [
+        {"$match": {"created_at": {"$gte": start, "$lt": end}}},
+        {"$group": {
+            "_id": {"user_id": "$user_id", "rating": "$overall_rating"},
+            "count": {"$sum": 1},
+            "first_at": {"$min": "$created_at"},
+            "last_at": {"$max": "$created_at"},
+            **sums
+        }},
+        {"$group": {
+            "_id": "$_id.user_id",
+            "count": {"$sum": "$count"},
+            "first_at": {"$min": "$first_at"},
+            "last_at": {"$max": "$last_at"},
+            "ratings": {"$push": {"k": "$_id.rating", "v": "$count"}},
+            **{name: {"$sum": f"${name}"} for name in sums}
+        }},
+        {"$project": {
+            "_id": 0,
+            "user_id": "$_id",
+            "month": month,
+            "count": 1,
+            "first_at": 1,
+            "last_at": 1,
+            "rating_distribution": {"$arrayToObject": "$ratings"},
+            **{f"total_{field}": f"$sum_{field}" for field in SCORE_FIELDS},
+            **{f"avg_{field}": {"$divide": [f"$sum_{field}", "$count"]} for field in SCORE_FIELDS},
+            "archived_at": "$$NOW"
+        }},
+        {"$merge": {
+            "into": "impact_log_summaries",
+            "on": ["user_id", "month"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert"
+        }}
+    ]
+
+def _iter_archive_file(
+    path: str,
+    user_id: Optional[str] = None,
+    exclude_users: Optional[Set[str]] = None
+) -> Iterator[Dict]:
+    if not os.path.exists(path):
+        return
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if user_id is not None and f'"{user_id}"' not in line:
+                continue
+            document = json_util.loads(line, json_options=LOAD_JSON_OPTIONS)
+            if user_id is not None and document.get("user_id") != user_id:
+                continue
+            if exclude_users and document.get("user_id") in exclude_users:
+                continue
+            yield document
+
+def iter_archive_month(
+    month: str,
+    buckets: int,
+    user_id: Optional[str] = None,
+    exclude_users: Optional[Set[str]] = None
+) -> Iterator[Dict]:
+    """Stream a month's archived documents in created_at order.
+
+    With user_id only that user's bucket file is read; otherwise the bucket
+    files are merged.
+    """
+    if user_id is not None:
+        paths = [archive_path(month, user_bucket(user_id, buckets))]
+    else:
+        paths = [archive_path(month, bucket) for bucket in range(buckets)]
+    streams = [_iter_archive_file(path, user_id, exclude_users) for path in paths]
+    yield from heapq.merge(*streams, key=lambda document: document["created_at"])
+
+def _write_buckets(directory: str, files: Dict, pending: Dict[int, List[str]]):
+    for bucket, lines in pending.items():
+        f = files.get(bucket)
+        if f is None:
+            f = files[bucket] = gzip.open(
+                os.path.join(directory, f"{bucket:03d}.ndjson.gz"), "wt", encoding="utf-8"
+            )
+        f.writelines(lines)
+
+def _close_files(files: Dict):
+    for f in files.values():
+        f.close()
+
+async def _export_month(database, month: str, owner: str) -> int:
+    start, end = month_bounds(month)
+    cursor = database[IMPACT_LOGS_COLLECTION].find(
+        {"created_at": {"$gte": start, "$lt": end}}
+    ).sort("created_at", 1)
+
+    # Stream into per-bucket gzip files from a worker thread, one batch at a
+    # time; the month directory is published with a rename once complete
+    path = archive_dir(month)
+    tmp_path = f"{path}.{owner}.tmp"
+    os.makedirs(tmp_path, exist_ok=True)
+    files: Dict = {}
+    count = 0
+    try:
+        pending: Dict[int, List[str]] = {}
+        pending_count = 0
+        async for document in cursor:
+            bucket = user_bucket(document.get("user_id"), ARCHIVE_BUCKETS)
+            pending.setdefault(bucket, []).append(
+                json_util.dumps(document, json_options=JSON_OPTIONS) + "\n"
+            )
+            pending_count += 1
+            if pending_count >= 1000:
+                await asyncio.to_thread(_write_buckets, tmp_path, files, pending)
+                count += pending_count
+                pending, pending_count = {}, 0
+        if pending:
+            await asyncio.to_thread(_write_buckets, tmp_path, files, pending)
+            count += pending_count
+    finally:
+        await asyncio.to_thread(_close_files, files)
+    try:
+        await _renew_lease(database, owner)
+    except LeaseLost:
+        shutil.rmtree(tmp_path)
+        raise
+    if os.path.exists(path):
+        # Left by a run that stopped before recording the export
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+    return count
+
+async def _delete_month(database, month: str, owner: str) -> int:
+    start, end = month_bounds(month)
+    collection = database[IMPACT_LOGS_COLLECTION]
+    deleted = 0
+    while True:
+        ids = await collection.find(
+            {"created_at": {"$gte": start, "$lt": end}}, {"_id": 1}
+        ).limit(ARCHIVE_DELETE_BATCH).to_list(length=ARCHIVE_DELETE_BATCH)
+        if not ids:
+            return deleted
+        await _renew_lease(database, owner)
+        result = await collection.delete_many({
+            "_id": {"$in": [doc["_id"] for doc in ids]},
+            "created_at": {"$gte": start, "$lt": end}
+        })
+        deleted += result.deleted_count
+        await asyncio.sleep(ARCHIVE_DELETE_PAUSE_MS / 1000)
+
+async def archive_month(database, month: str, owner: str):
+    runs = database.archive_runs
+    state = await runs.find_one({"_id": month}) or {}
+    status = state.get("status")
+
+    if status == "done":
+        # The month's file is final; never delete rows that were not exported
+        print(f"Skipping {month}: already archived but new logs appeared for it")
+        return
+
+    if status not in ("summarized", "done"):
+        exported = await _export_month(database, month, owner)
+        await runs.update_one(
+            {"_id": month},
+            {"$set": {
+                "status": "exported",
+                "exported": exported,
+                "buckets": ARCHIVE_BUCKETS,
+                "updated_at": datetime.utcnow()
+            }},
+            upsert=True
+        )
+        start, end = month_bounds(month)
+        cursor = database[IMPACT_LOGS_COLLECTION].aggregate(build_summary_pipeline(start, end, month))
+        await cursor.to_list(length=None)
+        await runs.update_one(
+            {"_id": month},
+            {"$set": {"status": "summarized", "updated_at": datetime.utcnow()}}
+        )
+        print(f"Archived {exported} impact logs for {month} to {archive_dir(month)}")
+
+    deleted = await _delete_month(database, month, owner)
+    await runs.update_one(
+        {"_id": month},
+        {"$set": {"status": "done", "updated_at": datetime.utcnow()},
+         "$inc": {"deleted": deleted}}
+    )
+    if deleted:
+        print(f"Deleted {deleted} archived impact logs for {month}")
+
+async def run_archival(database, owner: str):
+    """Archive every whole month older than the retention cutoff.
+
+    The caller must hold the lease as owner; it is renewed before each month
+    and checked again before the archive file is published and rows deleted.
+    """
+    cutoff = archive_cutoff()
+    collection = database[IMPACT_LOGS_COLLECTION]
+    await database.impact_log_summaries.create_index([("user_id", 1), ("month", 1)], unique=True)
+
+    months = await collection.aggregate([
+        {"$match": {"created_at": {"$lt": cutoff}}},
+        {"$group": {"_id": {"$dateToString": {"format": "%Y-%m", "date": "$created_at"}}}},
+        {"$sort": {"_id": 1}}
+    ]).to_list(length=None)
+
+    for month in months:
+        await _renew_lease(database, owner)
+        await archive_month(database, month["_id"], owner)
+
+async def _acquire_lease(database, owner: str) -> bool:
+    now = datetime.utcnow()
+    try:
+        await database.archive_runs.update_one(
+            {"_id": "lease", "$or": [{"owner": owner}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(minutes=ARCHIVE_LEASE_MINUTES)}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        # Upsert hit the existing lease held by another worker
+        return False
+
+async def _renew_lease(database, owner: str):
+    if not await _acquire_lease(database, owner):
+        raise LeaseLost(f"Archival lease lost by {owner}")
+
+async def _release_lease(database, owner: str):
+    await database.archive_runs.delete_one({"_id": "lease", "owner": owner})
+
+async def archival_loop():
+    """Background task started from main.py when ARCHIVE_ENABLED is set"""
+    owner = uuid.uuid4().hex
+    while True:
+        try:
+            database = await get_database()
+            if await _acquire_lease(database, owner):
+                try:
+                    await run_archival(database, owner)
+                finally:
+                    await _release_lease(database, owner)
+        except asyncio.CancelledError:
+            raise
+        except LeaseLost as e:
+            print(f"Archival run stopped: {e}")
+        except Exception as e:
+            print(f"Archival run failed: {e}")
+        await asyncio.sleep(ARCHIVE_INTERVAL_HOURS * 3600)
+
+async def archived_months(database) -> List[Dict]:
+    """archive_runs entries of months whose logs are (being) removed from Mongo, oldest first"""
+    return await database.archive_runs.find(
+        {"status": {"$in": ["summarized", "done"]}}
+    ).sort("_id", 1).to_list(length=None)
+
+async def iter_logs_with_archive(
+    user_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> AsyncIterator[Dict]:
+    """Yield archived then live impact logs in [start, end), oldest first.
+
+    Pass user_id to restrict the export to one user. start/end must be naive
+    UTC (see to_naive_utc). Archived rows of deleted users are filtered out
+    against the deleted_users tombstones.
+    """
+    database = await get_database()
+    deleted_users = set(await database.deleted_users.distinct("_id"))
+    runs = await archived_months(database)
+    for run in runs:
+        if user_id is not None and user_id in deleted_users:
+            break
+        month = run["_id"]
+        month_start, month_end = month_bounds(month)
+        if (start and month_end <= start) or (end and month_start >= end):
+            continue
+        documents = iter_archive_month(month, run.get("buckets", ARCHIVE_BUCKETS), user_id, deleted_users)
+        try:
+            while True:
+                batch = await asyncio.to_thread(lambda: list(islice(documents, ARCHIVE_READ_BATCH)))
+                if not batch:
+                    break
+                for document in batch:
+                    created_at = document["created_at"]
+                    if (start and created_at < start) or (end and created_at >= end):
+                        continue
+                    yield document
+        finally:
+            documents.close()
+
+    live_query = {"user_id": user_id} if user_id is not None else {}
+    if start or end:
+        live_query["created_at"] = {}
+        if start:
+            live_query["created_at"]["$gte"] = start
+        if end:
+            live_query["created_at"]["$lt"] = end
+    archived = {run["_id"] for run in runs}
+    async for document in database[IMPACT_LOGS_COLLECTION].find(live_query).sort("created_at", 1):
+        # Skip rows of a month whose export finished but deletion has not
+        if month_key(document["created_at"]) in archived:
+            continue
+        yield document
+
+def export_line(document: Dict) -> str:
+    """One NDJSON line for user/admin exports"""
+    document = dict(document)
+    document["id"] = str(document.pop("_id"))
+    return json.dumps(document, default=lambda value: value.isoformat()
+                      if isinstance(value, datetime) else str(value)) + "\n"
+
+async def main():
+    from app.database import connect_to_mongo, close_mongo_connection
+    await connect_to_mongo()
+    try:
+        database = await get_database()
+        owner = uuid.uuid4().hex
+        if not await _acquire_lease(database, owner):
+            print("Another archival run holds the lease; try again later")
+            return
+        try:
+            await run_archival(database, owner)
+        finally:
+            await _release_lease(database, owner)
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
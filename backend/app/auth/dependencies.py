@@ -2,9 +2,60 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.auth.jwt_handler import decode_token
 from app.database import get_database
+from app.cache import get_cache
 from bson import ObjectId
+import os
 
 security = HTTPBearer()
+user_cache = get_cache("users")
+deleted_user_cache = get_cache("deleted_users")
+# 0 disables the user cache (needed with CACHE_URL=memory and several workers,
+# since other workers never see the invalidation)
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "60"))  # seconds
+
+async def _fetch_user(user_id: str):
+    db = await get_database()
+    user = await db.users.find_one({"_id": ObjectId(user_id)})
+    if user is None:
+        return None
+    return {
+        "id": str(user["_id"]),
+        "email": user["email"],
+        "full_name": user["full_name"],
+        "role": user["role"]
+    }
+
+async def is_user_deleted(user_id: str) -> bool:
+    """Check the deleted_users tombstone, cached like the user itself"""
+    async def fetch():
+        db = await get_database()
+        return await db.deleted_users.find_one({"_id": user_id}, {"_id": 1}) is not None
+    
+    return await deleted_user_cache.get_or_set(user_id, fetch, ttl=USER_CACHE_TTL)
+
+async def load_user(user_id: str):
+    """Fetch the public user fields, cached across workers.
+
+    A user entry cached by a request that raced delete_user could outlive the
+    invalidation, so cached users are also checked against the tombstone.
+    """
+    if USER_CACHE_TTL <= 0:
+        return await _fetch_user(user_id)
+    if await is_user_deleted(user_id):
+        return None
+    return await user_cache.get_or_set(user_id, lambda: _fetch_user(user_id), ttl=USER_CACHE_TTL)
+
+async def invalidate_user(user_id: str):
+    await user_cache.delete(user_id)
+
+async def mark_user_deleted(user_id: str):
+    """Call after the deleted_users tombstone is written.
+
+    An explicit set wins over cache fills still in flight (they only store
+    into empty keys), so the token stops authenticating on every worker.
+    """
+    await deleted_user_cache.set(user_id, True, ttl=USER_CACHE_TTL)
+    await invalidate_user(user_id)
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
@@ -23,8 +74,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="Invalid token payload"
         )
     
-    db = await get_database()
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
+    user = await load_user(user_id)
     
     if user is None:
         raise HTTPException(
@@ -32,12 +82,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="User not found"
         )
     
-    return {
-        "id": str(user["_id"]),
-        "email": user["email"],
-        "full_name": user["full_name"],
-        "role": user["role"]
-    }
+    return user
 
 async def get_current_admin(current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "admin":
@@ -0,0 +1,122 @@
+from typing import Any, Callable, Awaitable, Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+import asyncio
+
+class GroupCommitWriter:
+    """Buffers inserts for one collection and flushes them with insert_many.
+
+    A batch is written when it reaches max_batch documents or max_delay_ms
+    after its first document arrived, whichever comes first. Every caller of
+    insert() awaits its own document: it gets the inserted _id back, or the
+    exception for that document if its write failed.
+
+    prepare, if given, is awaited with each batch's documents right before
+    insert_many and may modify them in place; if it fails, the whole batch
+    fails.
+    """
+
+    def __init__(
+        self,
+        get_collection: Callable[[], Awaitable[Any]],
+        max_batch: int = 100,
+        max_delay_ms: float = 5,
+        prepare: Optional[Callable[[List[Dict]], Awaitable[Any]]] = None,
+    ):
+        self.get_collection = get_collection
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.prepare = prepare
+        self._buffer: List[Tuple[Dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._flushes: set = set()
+        self._closed = False
+
+    async def insert(self, document: Dict) -> ObjectId:
+        if self._closed:
+            raise RuntimeError("GroupCommitWriter is closed")
+
+        # Assign the id up front so it is known regardless of batch outcome
+        document.setdefault("_id", ObjectId())
+        future = asyncio.get_running_loop().create_future()
+        self._buffer.append((document, future))
+
+        if len(self._buffer) >= self.max_batch:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+        return await future
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.max_delay)
+        self._timer = None
+        self._start_flush()
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        task = asyncio.create_task(self._write(batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _write(self, batch: List[Tuple[Dict, asyncio.Future]]):
+        documents = [document for document, _ in batch]
+        failed: Dict[int, Exception] = {}
+        try:
+            if self.prepare is not None:
+                await self.prepare(documents)
+            collection = await self.get_collection()
+            await collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                failed[error["index"]] = BulkWriteError({
+                    "writeErrors": [error],
+                    "nInserted": 0,
+                })
+            # A write-concern error leaves the outcome of every document unknown
+            if e.details.get("writeConcernErrors"):
+                failed = {index: e for index in range(len(batch))}
+        except Exception as e:
+            failed = {index: e for index in range(len(batch))}
+
+        for index, (document, future) in enumerate(batch):
+            if future.done():
+                continue
+            if index in failed:
+                future.set_exception(failed[index])
+            else:
+                future.set_result(document["_id"])
+
+    async def flush(self):
+        """Write everything buffered so far and wait for in-flight batches"""
+        self._start_flush()
+        if self._flushes:
+            # Shield the writes: a caller timing out must not cancel an
+            # insert_many that may already have reached the server
+            await asyncio.gather(
+                *[asyncio.shield(task) for task in self._flushes],
+                return_exceptions=True
+            )
+
+    async def close(self, timeout: float = 5):
+        """Stop accepting documents and flush, waiting at most timeout seconds.
+
+        Batches still in flight after the timeout are not cancelled, but the
+        caller usually closes the Mongo client next, so they fail and their
+        callers get that error (the server may still have applied them).
+        """
+        self._closed = True
+        try:
+            await asyncio.wait_for(self.flush(), timeout)
+        except asyncio.TimeoutError:
+            # Documents that never left the buffer are failed here
+            print(f"Group commit flush timed out after {timeout}s")
+        buffered, self._buffer = self._buffer, []
+        for _, future in buffered:
+            if not future.done():
+                future.set_exception(RuntimeError("GroupCommitWriter closed before flush"))
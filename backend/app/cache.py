@@ -0,0 +1,290 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Union
+import asyncio
+import inspect
+import json
+import os
+import time
+import uuid
+
+# CACHE_URL selects the backend: empty/"memory" keeps everything in-process,
+# redis://... shares entries across workers and pods.
+CACHE_URL = os.getenv("CACHE_URL", "memory")
+CACHE_PREFIX = os.getenv("CACHE_PREFIX", "ecotrack")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+# Seconds a value fetched from Redis is kept in the per-worker near cache
+CACHE_NEAR_TTL = float(os.getenv("CACHE_NEAR_TTL", "5"))
+# Seconds a loader may hold the cross-worker recompute lock
+CACHE_LOCK_TTL = float(os.getenv("CACHE_LOCK_TTL", "10"))
+
+INVALIDATION_CHANNEL = f"{CACHE_PREFIX}:invalidate"
+
+class MemoryBackend:
+    """In-process LRU cache with per-entry TTLs"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        self._data.clear()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, nx: bool = False) -> bool:
+        if nx and await self.get(key) is not None:
+            return False
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+        return True
+
+    async def delete(self, keys: Iterable[str]):
+        for key in keys:
+            self._data.pop(key, None)
+
+    async def delete_prefix(self, prefix: str):
+        for key in [k for k in self._data if k.startswith(prefix)]:
+            del self._data[key]
+
+    async def acquire_lock(self, key: str, ttl: float) -> bool:
+        # A single process is already serialised by Cache's asyncio locks
+        return True
+
+    async def release_lock(self, key: str):
+        pass
+
+class RedisBackend:
+    """Shared Redis backend with a short-lived per-worker near cache.
+
+    Writes and deletes go to Redis and are broadcast on INVALIDATION_CHANNEL so
+    every worker drops its near-cache copy. Works with anything speaking the
+    Redis protocol (redis-server, KeyDB, a local stand-in for tests).
+    """
+
+    def __init__(self, url: str, max_entries: int = CACHE_MAX_ENTRIES):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self._near = MemoryBackend(max_entries)
+        self._origin = uuid.uuid4().hex
+        self._lock_tokens: Dict[str, str] = {}
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._pubsub = self._redis.pubsub()
+        await self._pubsub.subscribe(INVALIDATION_CHANNEL)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def close(self):
+        if self._listener:
+            self._listener.cancel()
+        if self._pubsub:
+            await self._pubsub.unsubscribe(INVALIDATION_CHANNEL)
+            await self._pubsub.close()
+        await self._redis.close()
+        await self._near.close()
+
+    async def _listen(self):
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    payload = json.loads(message["data"])
+                    if payload.get("origin") == self._origin:
+                        continue
+                    await self._near.delete(payload.get("keys", []))
+                    for prefix in payload.get("prefixes", []):
+                        await self._near.delete_prefix(prefix)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Missed invalidations are bounded by CACHE_NEAR_TTL
+                print(f"Cache invalidation listener error: {e}")
+                await self._near.delete_prefix("")
+                await asyncio.sleep(1)
+
+    async def _publish(self, keys=(), prefixes=()):
+        payload = {"origin": self._origin, "keys": list(keys), "prefixes": list(prefixes)}
+        await self._redis.publish(INVALIDATION_CHANNEL, json.dumps(payload))
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self._near.get(key)
+        if value is not None:
+            return value
+        raw = await self._redis.get(key)
+        if raw is None:
+            return None
+        value = json.loads(raw)
+        await self._near.set(key, value, CACHE_NEAR_TTL)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, nx: bool = False) -> bool:
+        raw = json.dumps(value, default=str)
+        stored = await self._redis.set(key, raw, px=int(ttl * 1000) if ttl else None, nx=nx)
+        if not stored:
+            return False
+        near_ttl = min(ttl, CACHE_NEAR_TTL) if ttl else CACHE_NEAR_TTL
+        await self._near.set(key, value, near_ttl)
+        await self._publish(keys=[key])
+        return True
+
+    async def delete(self, keys: Iterable[str]):
+        keys = list(keys)
+        if not keys:
+            return
+        await self._redis.delete(*keys)
+        await self._near.delete(keys)
+        await self._publish(keys=keys)
+
+    async def delete_prefix(self, prefix: str):
+        batch = []
+        async for key in self._redis.scan_iter(match=f"{prefix}*", count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                await self._redis.delete(*batch)
+                batch = []
+        if batch:
+            await self._redis.delete(*batch)
+        await self._near.delete_prefix(prefix)
+        await self._publish(prefixes=[prefix])
+
+    async def acquire_lock(self, key: str, ttl: float) -> bool:
+        token = uuid.uuid4().hex
+        acquired = await self._redis.set(f"{key}:lock", token, nx=True, px=int(ttl * 1000))
+        if acquired:
+            self._lock_tokens[key] = token
+        return bool(acquired)
+
+    async def release_lock(self, key: str):
+        token = self._lock_tokens.pop(key, None)
+        if token is None:
+            return
+        lock_key = f"{key}:lock"
+        current = await self._redis.get(lock_key)
+        if current is not None and current.decode() == token:
+            await self._redis.delete(lock_key)
+
+class CacheState:
+    backend: Optional[Union[MemoryBackend, RedisBackend]] = None
+
+cache_state = CacheState()
+
+class Cache:
+    """Namespaced view over the configured backend.
+
+    Keys are stored as "<CACHE_PREFIX>:<namespace>:<key>". Values must be
+    JSON-serialisable so the Redis backend can share them between workers.
+    """
+
+    _locks: Dict[str, asyncio.Lock] = {}
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.prefix = f"{CACHE_PREFIX}:{namespace}:"
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    @property
+    def _backend(self):
+        if cache_state.backend is None:
+            cache_state.backend = MemoryBackend()
+        return cache_state.backend
+
+    async def get(self, key: str) -> Optional[Any]:
+        return await self._backend.get(self._key(key))
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        await self._backend.set(self._key(key), value, ttl)
+
+    async def delete(self, *keys: str):
+        await self._backend.delete([self._key(key) for key in keys])
+
+    async def clear(self):
+        await self._backend.delete_prefix(self.prefix)
+
+    async def get_or_set(
+        self,
+        key: str,
+        loader: Callable[[], Union[Any, Awaitable[Any]]],
+        ttl: Optional[float] = None,
+    ) -> Any:
+        """Return the cached value or compute it once.
+
+        Concurrent misses for the same key in this worker wait on one asyncio
+        lock; across workers the backend lock lets a single loader run while
+        the others poll for its result (until CACHE_LOCK_TTL elapses).
+
+        The loaded value is only stored if the key is still empty, so a slow
+        loader never overwrites a value written with set() in the meantime.
+        """
+        full_key = self._key(key)
+        value = await self._backend.get(full_key)
+        if value is not None:
+            return value
+
+        lock = Cache._locks.setdefault(full_key, asyncio.Lock())
+        try:
+            async with lock:
+                value = await self._backend.get(full_key)
+                if value is not None:
+                    return value
+
+                owns_lock = await self._backend.acquire_lock(full_key, CACHE_LOCK_TTL)
+                if not owns_lock:
+                    deadline = time.monotonic() + CACHE_LOCK_TTL
+                    while time.monotonic() < deadline:
+                        await asyncio.sleep(0.05)
+                        value = await self._backend.get(full_key)
+                        if value is not None:
+                            return value
+
+                try:
+                    value = loader()
+                    if inspect.isawaitable(value):
+                        value = await value
+                    if value is not None and not await self._backend.set(full_key, value, ttl, nx=True):
+                        stored = await self._backend.get(full_key)
+                        if stored is not None:
+                            value = stored
+                    return value
+                finally:
+                    if owns_lock:
+                        await self._backend.release_lock(full_key)
+        finally:
+            if not lock.locked():
+                Cache._locks.pop(full_key, None)
+
+def get_cache(namespace: str) -> Cache:
+    return Cache(namespace)
+
+async def connect_cache():
+    if CACHE_URL and CACHE_URL != "memory":
+        cache_state.backend = RedisBackend(CACHE_URL)
+    else:
+        cache_state.backend = MemoryBackend()
+    await cache_state.backend.start()
+    print(f"Cache backend: {type(cache_state.backend).__name__}")
+
+async def close_cache():
+    if cache_state.backend:
+        await cache_state.backend.close()
+        cache_state.backend = None
+        print("Closed cache backend")
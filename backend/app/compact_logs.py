@@ -0,0 +1,111 @@
+"""Backfill: move embedded tip / analysis text of existing logs into the text catalog.
+
+Usage:
+    python -m app.compact_logs [--batch-size 1000] [--max-docs-per-sec 0]
+
+Logs still carrying a `tips` or `ai_analysis` field are streamed through one
+cursor in created_at order (indexed in both storage modes) and compacted with the same rule as new logs (app.utils.text_catalog): rule-based
+tips and text seen earlier in the run become `tip_ids` / `ai_analysis_id`,
+with one catalog write per batch and an unordered bulk_write for the logs.
+One-off text stays inline, so those logs match again on a later run.
+The created_at of the last batch is checkpointed in the `migrations`
+collection and cleared when the run completes; re-runs are safe.
+
+Time-series collections need a MongoDB release that allows updating
+non-metaField fields.
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from datetime import datetime
+from pymongo import UpdateOne
+import argparse
+import asyncio
+import os
+import time
+
+from app.database import IMPACT_LOGS_COLLECTION
+from app.utils.text_catalog import compact_log_texts
+
+UNCOMPACTED = {"$or": [{"tips": {"$exists": True}}, {"ai_analysis": {"$exists": True}}]}
+
+async def compact_batch(database, collection, logs):
+    await compact_log_texts(database, logs)
+
+    updates = []
+    for log in logs:
+        changes = {field: log[field] for field in ("tip_ids", "ai_analysis_id") if field in log}
+        if not changes:
+            continue
+        removed = {"tips": ""} if "tip_ids" in changes else {}
+        if "ai_analysis_id" in changes:
+            removed["ai_analysis"] = ""
+        updates.append(UpdateOne(
+            {"_id": log["_id"], "created_at": log["created_at"]},
+            {"$set": changes, "$unset": removed}
+        ))
+    if not updates:
+        return 0
+    result = await collection.bulk_write(updates, ordered=False)
+    return result.modified_count
+
+async def compact(args):
+    client = AsyncIOMotorClient(os.getenv("MONGODB_URL", "mongodb://localhost:27017"))
+    database = client.ecotrack
+    collection = database[IMPACT_LOGS_COLLECTION]
+
+    checkpoint_id = f"compact:{IMPACT_LOGS_COLLECTION}"
+    checkpoint = await database.migrations.find_one({"_id": checkpoint_id}) or {}
+    last_created_at = checkpoint.get("last_created_at")
+    compacted = checkpoint.get("compacted", 0)
+
+    projection = {"tips": 1, "ai_analysis": 1, "created_at": 1}
+    started = time.monotonic()
+    processed = 0
+    async def process(logs):
+        nonlocal compacted, processed
+        compacted += await compact_batch(database, collection, logs)
+        last_created_at = logs[-1]["created_at"]
+        await database.migrations.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"last_created_at": last_created_at, "compacted": compacted, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+        print(f"Compacted {compacted} logs (up to {last_created_at})")
+
+        processed += len(logs)
+        if args.max_docs_per_sec > 0:
+            ahead = processed / args.max_docs_per_sec - (time.monotonic() - started)
+            if ahead > 0:
+                await asyncio.sleep(ahead)
+
+    try:
+        query = dict(UNCOMPACTED)
+        if last_created_at is not None:
+            query["created_at"] = {"$gte": last_created_at}
+        cursor = collection.find(query, projection) \
+            .sort("created_at", 1) \
+            .batch_size(args.batch_size)
+
+        logs = []
+        async for log in cursor:
+            logs.append(log)
+            if len(logs) >= args.batch_size:
+                await process(logs)
+                logs = []
+        if logs:
+            await process(logs)
+
+        await database.migrations.delete_one({"_id": checkpoint_id})
+    finally:
+        client.close()
+
+    print(f"Done: {compacted} logs compacted in {time.monotonic() - started:.1f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Move embedded tip / analysis text into the text catalog")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--max-docs-per-sec", type=float, default=0,
+                        help="Throttle; 0 means unlimited")
+    asyncio.run(compact(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,98 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from typing import Optional
+from app.batch_writer import GroupCommitWriter
+from app.utils.text_catalog import compact_log_texts
 import os
 
+# Storage mode for impact logs: "standard" (plain collection) or "timeseries"
+# (MongoDB >= 6.0 time-series collection with created_at as timeField and
+# user_id as metaField). Switching modes needs `python -m app.migrate_timeseries`.
+IMPACT_LOGS_STORAGE = os.getenv("IMPACT_LOGS_STORAGE", "standard").lower()
+IMPACT_LOGS_COLLECTION = os.getenv(
+    "IMPACT_LOGS_COLLECTION",
+    "impact_logs_ts" if IMPACT_LOGS_STORAGE == "timeseries" else "impact_logs"
+)
+TIMESERIES_OPTIONS = {
+    "timeField": "created_at",
+    "metaField": "user_id",
+    "granularity": "hours"
+}
+
+# Group commit for impact_logs: buffer inserts for up to IMPACT_LOG_BATCH_DELAY_MS
+# or IMPACT_LOG_BATCH_SIZE documents and write them with a single insert_many
+IMPACT_LOG_GROUP_COMMIT = os.getenv("IMPACT_LOG_GROUP_COMMIT", "false").lower() == "true"
+IMPACT_LOG_BATCH_SIZE = int(os.getenv("IMPACT_LOG_BATCH_SIZE", "100"))
+IMPACT_LOG_BATCH_DELAY_MS = float(os.getenv("IMPACT_LOG_BATCH_DELAY_MS", "5"))
+SHUTDOWN_FLUSH_TIMEOUT = float(os.getenv("SHUTDOWN_FLUSH_TIMEOUT", "5"))
+
 class Database:
     client: Optional[AsyncIOMotorClient] = None
+    impact_log_writer: Optional[GroupCommitWriter] = None
 
 db = Database()
 
 async def get_database():
     return db.client.ecotrack
 
+async def get_impact_logs_collection():
+    database = await get_database()
+    return database[IMPACT_LOGS_COLLECTION]
+
+async def ensure_impact_logs_collection(database=None):
+    """Create the impact logs collection for the configured mode and its indexes"""
+    database = database if database is not None else await get_database()
+    
+    if IMPACT_LOGS_STORAGE == "timeseries":
+        existing = await database.list_collection_names(filter={"name": IMPACT_LOGS_COLLECTION})
+        if not existing:
+            await database.create_collection(
+                IMPACT_LOGS_COLLECTION,
+                timeseries=TIMESERIES_OPTIONS
+            )
+    
+    collection = database[IMPACT_LOGS_COLLECTION]
+    # History / chat context lookups and admin listing
+    await collection.create_index([("user_id", 1), ("created_at", -1)])
+    await collection.create_index([("created_at", -1)])
+
+async def prepare_impact_logs(impact_logs: list):
+    """Swap repeated tip / analysis text for text catalog references.
+
+    With group commit this runs once per batch, so new catalog entries cost
+    one bulk_write per batch rather than one per submission.
+    """
+    await compact_log_texts(await get_database(), impact_logs)
+
+async def insert_impact_log(impact_log: dict):
+    """Insert one impact log, through the group-commit writer when enabled.
+
+    Returns the inserted _id.
+    """
+    if db.impact_log_writer is not None:
+        return await db.impact_log_writer.insert(impact_log)
+    
+    await prepare_impact_logs([impact_log])
+    collection = await get_impact_logs_collection()
+    result = await collection.insert_one(impact_log)
+    return result.inserted_id
+
 async def connect_to_mongo():
     mongodb_url = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
     db.client = AsyncIOMotorClient(mongodb_url)
-    print("Connected to MongoDB")
+    if IMPACT_LOG_GROUP_COMMIT:
+        db.impact_log_writer = GroupCommitWriter(
+            get_impact_logs_collection,
+            max_batch=IMPACT_LOG_BATCH_SIZE,
+            max_delay_ms=IMPACT_LOG_BATCH_DELAY_MS,
+            prepare=prepare_impact_logs
+        )
+    await ensure_impact_logs_collection()
+    print(f"Connected to MongoDB (impact logs: {IMPACT_LOGS_COLLECTION}, {IMPACT_LOGS_STORAGE})")
 
 async def close_mongo_connection():
+    if db.impact_log_writer:
+        await db.impact_log_writer.close(timeout=SHUTDOWN_FLUSH_TIMEOUT)
+        db.impact_log_writer = None
     if db.client:
         db.client.close()
-        print("Closed MongoDB connection")
\ No newline at end of file
+        print("Closed MongoDB connection")
@@ -0,0 +1,232 @@
+"""Live admin activity feed.
+
+Each worker runs one shared MongoDB change stream over the impact logs and
+users collections and fans events out to every connected admin WebSocket.
+It streams impact log inserts and user inserts / deletes. Impact logs are
+only ever deleted in bulk (archival batches, delete_user), which would send
+one event per row; those are filtered out on the server, and a user's
+deletion is reported by its user.delete event.
+Change streams need a replica set (a single-node one is enough locally);
+time-series collections do not support them, so with
+IMPACT_LOGS_STORAGE=timeseries only user events are streamed.
+
+Every event carries the change stream resume token. A client that reconnects
+with ?resume_after=<token> gets the events it missed: from this worker's
+bounded buffer if the token is in it, otherwise (an older token, or one from
+another worker) from a short-lived change stream of its own that resumes at
+the token and hands over to the shared stream once it catches up. If the
+oplog no longer has the token, or the client falls too far behind, it gets a
+{"type": "resync"} message and should reload through the REST endpoints.
+
+The shared stream stops when the last admin disconnects.
+"""
+from collections import deque
+from pymongo.errors import OperationFailure
+from typing import Dict, Optional, Set
+import asyncio
+import os
+
+from app.database import get_database, IMPACT_LOGS_COLLECTION, IMPACT_LOGS_STORAGE
+
+FEED_BUFFER_SIZE = int(os.getenv("FEED_BUFFER_SIZE", "1000"))
+# A client queue must hold a full buffer replay, or the replay turns into a resync
+FEED_CLIENT_QUEUE_SIZE = max(int(os.getenv("FEED_CLIENT_QUEUE_SIZE", "2000")), FEED_BUFFER_SIZE)
+
+LOG_FIELDS = [
+    "user_id", "transport_method", "diet_type", "carbon_score", "water_score",
+    "energy_score", "waste_score", "overall_rating", "created_at"
+]
+USER_FIELDS = ["email", "full_name", "role", "created_at"]
+
+RESYNC = {"type": "resync"}
+CHANGE_STREAM_HISTORY_LOST = 286
+
+def _after(token: str, last: Optional[str]) -> bool:
+    # Resume token _data values are hex strings that sort in oplog order
+    return last is None or token > last
+
+class FeedClient:
+    """One connected admin. Events queue up to maxsize; if the client falls
+    further behind, the backlog is dropped and replaced by a resync message.
+    Events at or before the last one queued are skipped, so a replay and the
+    live stream can overlap.
+    """
+
+    def __init__(self, maxsize: int = FEED_CLIENT_QUEUE_SIZE):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.last_token: Optional[str] = None
+
+    def push(self, event: Dict) -> bool:
+        """Queue an event; returns False if the client had to be resynced"""
+        token = event.get("resume_token")
+        if token is not None:
+            if not _after(token, self.last_token):
+                return True
+            self.last_token = token
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+            return False
+
+class ChangeFeed:
+    def __init__(self):
+        self.clients: Set[FeedClient] = set()
+        self.catching_up: Dict[FeedClient, asyncio.Task] = {}
+        self.buffer: deque = deque(maxlen=FEED_BUFFER_SIZE)
+        self.resume_token: Optional[Dict] = None
+        self._task: Optional[asyncio.Task] = None
+        # Set while the shared stream is open, i.e. the buffer is being filled
+        self._ready = asyncio.Event()
+
+    def _match(self):
+        users = {"ns.coll": "users", "operationType": {"$in": ["insert", "delete"]}}
+        if IMPACT_LOGS_STORAGE == "timeseries":
+            return users
+        return {"$or": [users, {"ns.coll": IMPACT_LOGS_COLLECTION, "operationType": "insert"}]}
+
+    def _pipeline(self):
+        return [
+            {"$match": self._match()},
+            {"$project": {
+                "operationType": 1,
+                "ns": 1,
+                "documentKey": 1,
+                **{f"fullDocument.{field}": 1 for field in set(LOG_FIELDS + USER_FIELDS)}
+            }}
+        ]
+
+    def _to_event(self, change: Dict) -> Dict:
+        kind = "user" if change["ns"]["coll"] == "users" else "impact_log"
+        fields = USER_FIELDS if kind == "user" else LOG_FIELDS
+        document = change.get("fullDocument") or {}
+        data = {}
+        for field in fields:
+            if field in document:
+                value = document[field]
+                data[field] = value.isoformat() if hasattr(value, "isoformat") else value
+        return {
+            "type": f"{kind}.{change['operationType']}",
+            "id": str(change["documentKey"]["_id"]),
+            "data": data,
+            "resume_token": change["_id"]["_data"]
+        }
+
+    def subscribe(self, resume_after: Optional[str] = None) -> FeedClient:
+        client = FeedClient()
+        self.start()
+        tokens = [event["resume_token"] for event in self.buffer]
+        if not resume_after:
+            self.clients.add(client)
+        elif resume_after in tokens:
+            client.last_token = resume_after
+            self._go_live(client)
+        else:
+            self.catching_up[client] = asyncio.create_task(self._catch_up(client, resume_after))
+        return client
+
+    def _go_live(self, client: FeedClient):
+        # Replay whatever the buffer has past the client's position, then fan
+        # out; no await in between, so no event can slip through
+        for event in self.buffer:
+            client.push(event)
+        self.clients.add(client)
+
+    async def _catch_up(self, client: FeedClient, token: str):
+        """Replay from the oplog until the shared stream's buffer takes over"""
+        client.last_token = token
+        try:
+            database = await get_database()
+            async with database.watch(self._pipeline(), resume_after={"_data": token}) as stream:
+                while True:
+                    change = await stream.try_next()
+                    if change is None:
+                        # Caught up with the present; hand over once the
+                        # shared stream is open
+                        if self._ready.is_set():
+                            break
+                        continue
+                    event = self._to_event(change)
+                    if self.buffer and not _after(self.buffer[0]["resume_token"], event["resume_token"]):
+                        break
+                    if not client.push(event):
+                        break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Unknown token, or the oplog no longer has it
+            print(f"Feed catch-up failed: {e}")
+            client.push(RESYNC)
+        self.catching_up.pop(client, None)
+        self._go_live(client)
+
+    def unsubscribe(self, client: FeedClient):
+        self.clients.discard(client)
+        task = self.catching_up.pop(client, None)
+        if task:
+            task.cancel()
+        if not self.clients and not self.catching_up and self._task:
+            # Nobody is listening; the buffer would have a gap once restarted
+            self._task.cancel()
+            self._task = None
+            self._reset()
+
+    def _reset(self):
+        self._ready.clear()
+        self.resume_token = None
+        self.buffer.clear()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        for task in self.catching_up.values():
+            task.cancel()
+        self.catching_up.clear()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._reset()
+
+    async def _watch(self):
+        delay = 1
+        while True:
+            try:
+                database = await get_database()
+                async with database.watch(self._pipeline(), resume_after=self.resume_token) as stream:
+                    self._ready.set()
+                    delay = 1
+                    async for change in stream:
+                        self.resume_token = change["_id"]
+                        event = self._to_event(change)
+                        self.buffer.append(event)
+                        for client in list(self.clients):
+                            client.push(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._ready.clear()
+                if isinstance(e, OperationFailure) and e.code == CHANGE_STREAM_HISTORY_LOST:
+                    # The oplog no longer has our position; start again from now
+                    self.resume_token = None
+                    self.buffer.clear()
+                    for client in list(self.clients):
+                        client.push(RESYNC)
+                    for client, task in list(self.catching_up.items()):
+                        task.cancel()
+                        self.catching_up.pop(client)
+                        client.push(RESYNC)
+                        self.clients.add(client)
+                print(f"Change stream error, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+feed = ChangeFeed()
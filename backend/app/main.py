@@ -1,6 +1,10 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.database import connect_to_mongo, close_mongo_connection
+from app.cache import connect_cache, close_cache
+from app.archive import ARCHIVE_ENABLED, archival_loop
+from app.live_feed import feed
+import asyncio
 from app.routes import auth, impact, admin
 
 app = FastAPI(
@@ -22,9 +26,17 @@ app.add_middleware(
 @app.on_event("startup")
 async def startup_db_client():
     await connect_to_mongo()
+    await connect_cache()
+    if ARCHIVE_ENABLED:
+        app.state.archival_task = asyncio.create_task(archival_loop())
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    archival_task = getattr(app.state, "archival_task", None)
+    if archival_task:
+        archival_task.cancel()
+    await feed.stop()
+    await close_cache()
     await close_mongo_connection()
 
 # Routes
@@ -0,0 +1,127 @@
+"""Online migration of impact logs into a time-series collection.
+
+Usage:
+    python -m app.migrate_timeseries [--source impact_logs] [--target impact_logs_ts]
+                                     [--batch-size 1000] [--final]
+
+Run it while the API still writes to the source collection: documents are
+copied in _id order and progress is checkpointed in the `migrations`
+collection, so the command can be stopped and re-run at any time. Documents
+newer than --lag-seconds are left for a later pass because concurrent writers
+may still be inserting ids just below them.
+
+Cut over by restarting the API with IMPACT_LOGS_STORAGE=timeseries, then run
+once more with --final to copy the tail and verify per-collection counts.
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from bson import ObjectId
+from datetime import datetime, timedelta
+import argparse
+import asyncio
+import os
+
+from app.database import TIMESERIES_OPTIONS
+
+async def ensure_target(database, target: str):
+    existing = await database.list_collection_names(filter={"name": target})
+    if existing:
+        options = await database[target].options()
+        if "timeseries" not in options:
+            raise SystemExit(f"Target collection '{target}' exists and is not a time-series collection")
+        return
+    await database.create_collection(target, timeseries=TIMESERIES_OPTIONS)
+    await database[target].create_index([("user_id", 1), ("created_at", -1)])
+    await database[target].create_index([("created_at", -1)])
+    print(f"Created time-series collection '{target}'")
+
+async def copy_batches(database, source: str, target: str, batch_size: int, lag_seconds: int):
+    checkpoint_id = f"timeseries:{source}->{target}"
+    checkpoint = await database.migrations.find_one({"_id": checkpoint_id}) or {}
+    last_id = checkpoint.get("last_id")
+    copied_total = checkpoint.get("copied", 0)
+
+    upper = None
+    if lag_seconds > 0:
+        upper = ObjectId.from_datetime(datetime.utcnow() - timedelta(seconds=lag_seconds))
+
+    while True:
+        id_filter = {}
+        if last_id is not None:
+            id_filter["$gt"] = last_id
+        if upper is not None:
+            id_filter["$lt"] = upper
+        query = {"_id": id_filter} if id_filter else {}
+
+        batch = await database[source].find(query).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+
+        # Time-series collections do not enforce unique _id, so skip documents
+        # already copied by an interrupted run before inserting
+        times = [doc["created_at"] for doc in batch]
+        already_copied = set(await database[target].distinct("_id", {
+            "_id": {"$in": [doc["_id"] for doc in batch]},
+            "created_at": {"$gte": min(times), "$lte": max(times)}
+        }))
+        pending = [doc for doc in batch if doc["_id"] not in already_copied]
+        if pending:
+            await database[target].insert_many(pending, ordered=False)
+
+        last_id = batch[-1]["_id"]
+        copied_total += len(batch)
+        await database.migrations.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"last_id": last_id, "copied": copied_total, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+        print(f"Copied {copied_total} documents (last _id {last_id})")
+
+    return last_id
+
+async def verify_counts(database, source: str, target: str, last_id) -> bool:
+    """Compare counts over the copied range only (_id <= last copied _id).
+
+    Whole-collection counts would let logs written to the target after cutover
+    hide documents that were never copied.
+    """
+    if last_id is None:
+        print("Nothing copied yet")
+        return True
+    query = {"_id": {"$lte": last_id}}
+    source_count = await database[source].count_documents(query)
+    target_count = await database[target].count_documents(query)
+    print(f"Up to _id {last_id}: source '{source}' has {source_count} documents, "
+          f"target '{target}' has {target_count}")
+    if source_count > target_count:
+        print("Target is missing documents; run the migration again")
+        return False
+    if source_count < target_count:
+        print("Target has extra documents (deleted from source after being copied)")
+    return True
+
+async def migrate(args):
+    client = AsyncIOMotorClient(os.getenv("MONGODB_URL", "mongodb://localhost:27017"))
+    database = client.ecotrack
+    try:
+        await ensure_target(database, args.target)
+        lag_seconds = 0 if args.final else args.lag_seconds
+        last_id = await copy_batches(database, args.source, args.target, args.batch_size, lag_seconds)
+        ok = await verify_counts(database, args.source, args.target, last_id)
+        if not ok:
+            raise SystemExit(1)
+    finally:
+        client.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy impact logs into a time-series collection")
+    parser.add_argument("--source", default="impact_logs")
+    parser.add_argument("--target", default="impact_logs_ts")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--lag-seconds", type=int, default=60,
+                        help="Skip documents newer than this; ignored with --final")
+    parser.add_argument("--final", action="store_true",
+                        help="Copy everything up to now, for use after cutover")
+    asyncio.run(migrate(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -16,4 +16,5 @@ class ImpactLogModel(BaseModel):
     waste_score: float
     overall_rating: str
     tips: List[str]
+    factor_version: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
@@ -0,0 +1,149 @@
+"""Rescore stored impact logs with a different emission-factor version.
+
+Usage:
+    python -m app.recompute_scores [--version v2] [--batch-size 1000]
+                                   [--concurrency 4] [--max-docs-per-sec 0]
+
+Logs whose factor_version differs from --version (default: the active
+EMISSION_FACTORS_VERSION; logs without one count as v1) are streamed through
+one cursor in created_at order (indexed in both storage modes; time-series
+collections have no _id index) with only the scoring inputs projected,
+rescored in memory and written back with unordered bulk_write updates. Up to
+--concurrency batches are in flight at once; --max-docs-per-sec throttles the
+write rate. The created_at of the last written batch is checkpointed in the
+`migrations` collection, so an interrupted run resumes from there; rescored
+logs no longer match the query, so the overlap at that timestamp is skipped.
+The checkpoint is cleared when a run completes, so a later run for the same
+version (e.g. after rolling back) rescans from the start; the query only
+matches logs scored with another version, so reruns are idempotent.
+
+Archived logs (see app.archive) and their monthly summaries are not touched.
+Time-series collections need a MongoDB release that allows updating
+non-metaField fields.
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from datetime import datetime
+from pymongo import UpdateOne
+import argparse
+import asyncio
+import os
+import time
+
+from app.database import IMPACT_LOGS_COLLECTION
+from app.utils.calculations import (
+    EMISSION_FACTORS_VERSION,
+    EMISSION_FACTOR_TABLES,
+    LEGACY_FACTOR_VERSION,
+    get_emission_factors,
+    score_inputs,
+)
+
+INPUT_FIELDS = ["transport_method", "transport_km", "electricity_kwh", "water_liters", "diet_type", "waste_kg"]
+SCORE_FIELDS = ["carbon_score", "water_score", "energy_score", "waste_score", "overall_rating"]
+
+def stale_filter(version: str) -> dict:
+    if version == LEGACY_FACTOR_VERSION:
+        return {"factor_version": {"$nin": [version, None]}}
+    return {"factor_version": {"$ne": version}}
+
+def build_updates(logs, factors, version: str):
+    updates = []
+    for log in logs:
+        scores = score_inputs(log, factors)
+        changes = {"factor_version": version}
+        changes.update({
+            field: scores[field] for field in SCORE_FIELDS
+            if log.get(field) != scores[field]
+        })
+        updates.append(UpdateOne({"_id": log["_id"], "created_at": log["created_at"]}, {"$set": changes}))
+    return updates
+
+async def recompute(args):
+    version = args.version
+    factors = get_emission_factors(version)
+    client = AsyncIOMotorClient(os.getenv("MONGODB_URL", "mongodb://localhost:27017"))
+    database = client.ecotrack
+    collection = database[IMPACT_LOGS_COLLECTION]
+
+    checkpoint_id = f"recompute:{IMPACT_LOGS_COLLECTION}:{version}"
+    checkpoint = await database.migrations.find_one({"_id": checkpoint_id}) or {}
+    last_created_at = checkpoint.get("last_created_at")
+    updated_total = checkpoint.get("updated", 0)
+
+    projection = {field: 1 for field in INPUT_FIELDS + SCORE_FIELDS + ["created_at"]}
+    in_flight = []
+    started = time.monotonic()
+    processed = 0
+
+    async def write(updates, batch_last_created_at):
+        result = await collection.bulk_write(updates, ordered=False)
+        return batch_last_created_at, result.modified_count
+
+    async def drain_oldest():
+        nonlocal updated_total
+        batch_last_created_at, modified = await in_flight.pop(0)
+        updated_total += modified
+        await database.migrations.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {
+                "last_created_at": batch_last_created_at,
+                "updated": updated_total,
+                "updated_at": datetime.utcnow()
+            }},
+            upsert=True
+        )
+        print(f"Rescored {updated_total} logs (up to {batch_last_created_at})")
+
+    async def submit(logs):
+        nonlocal processed
+        in_flight.append(asyncio.create_task(
+            write(build_updates(logs, factors, version), logs[-1]["created_at"])
+        ))
+        if len(in_flight) >= args.concurrency:
+            await drain_oldest()
+
+        processed += len(logs)
+        if args.max_docs_per_sec > 0:
+            ahead = processed / args.max_docs_per_sec - (time.monotonic() - started)
+            if ahead > 0:
+                await asyncio.sleep(ahead)
+
+    try:
+        query = stale_filter(version)
+        if last_created_at is not None:
+            query["created_at"] = {"$gte": last_created_at}
+        cursor = collection.find(query, projection) \
+            .sort("created_at", 1) \
+            .batch_size(args.batch_size)
+
+        logs = []
+        async for log in cursor:
+            logs.append(log)
+            if len(logs) >= args.batch_size:
+                await submit(logs)
+                logs = []
+        if logs:
+            await submit(logs)
+
+        while in_flight:
+            await drain_oldest()
+        await database.migrations.delete_one({"_id": checkpoint_id})
+    finally:
+        for task in in_flight:
+            task.cancel()
+        client.close()
+
+    elapsed = time.monotonic() - started
+    print(f"Done: {processed} logs scanned, {updated_total} updated to {version} in {elapsed:.1f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Rescore impact logs with an emission-factor version")
+    parser.add_argument("--version", default=EMISSION_FACTORS_VERSION, choices=sorted(EMISSION_FACTOR_TABLES))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--max-docs-per-sec", type=float, default=0,
+                        help="Throttle; 0 means unlimited")
+    asyncio.run(recompute(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from app.auth.dependencies import get_current_admin
-from app.database import get_database
+from fastapi import APIRouter, Depends, HTTPException, status, Query, WebSocket
+from fastapi.responses import StreamingResponse
+from app.auth.dependencies import get_current_admin, mark_user_deleted, load_user
+from app.auth.jwt_handler import decode_token
+from app.database import get_database, IMPACT_LOGS_COLLECTION
+from app.cache import get_cache
+from app.archive import archived_months, iter_logs_with_archive, export_line, month_bounds, to_naive_utc
+from app.live_feed import feed
+from app.utils.text_catalog import iter_rehydrated
+from app.utils.analytics import build_analytics_pipeline, format_analytics, get_date_range
 from bson import ObjectId
-from typing import List
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+import asyncio
 
 router = APIRouter()
+count_cache = get_cache("counts")
+COUNT_CACHE_TTL = 30  # seconds
+analytics_cache = get_cache("analytics")
+ANALYTICS_CACHE_TTL = 120  # seconds
+MAX_ANALYTICS_DAYS = 366
 
 @router.get("/users")
 async def get_all_users(
@@ -14,7 +28,11 @@ async def get_all_users(
 ):
     db = await get_database()
     
-    total = await db.users.count_documents({})
+    total = await count_cache.get_or_set(
+        "users:all",
+        lambda: db.users.count_documents({}),
+        ttl=COUNT_CACHE_TTL
+    )
     skip = (page - 1) * page_size
     
     cursor = db.users.find({}, {"password": 0}) \
@@ -66,7 +84,18 @@ async def delete_user(
         )
     
     # Delete user's impact logs
-    await db.impact_logs.delete_many({"user_id": user_id})
+    await db[IMPACT_LOGS_COLLECTION].delete_many({"user_id": user_id})
+    await db.impact_log_summaries.delete_many({"user_id": user_id})
+    # Archive files are immutable; exports filter deleted users against this
+    await db.deleted_users.update_one(
+        {"_id": user_id},
+        {"$set": {"deleted_at": datetime.utcnow()}},
+        upsert=True
+    )
+    
+    # Propagate to every worker so the deleted token stops authenticating
+    await mark_user_deleted(user_id)
+    await count_cache.delete("users:all", "impact_logs:all", f"impact_logs:{user_id}")
     
     return {"message": "User deleted successfully"}
 
@@ -78,10 +107,14 @@ async def get_all_logs(
 ):
     db = await get_database()
     
-    total = await db.impact_logs.count_documents({})
+    total = await count_cache.get_or_set(
+        "impact_logs:all",
+        lambda: db[IMPACT_LOGS_COLLECTION].count_documents({}),
+        ttl=COUNT_CACHE_TTL
+    )
     skip = (page - 1) * page_size
     
-    cursor = db.impact_logs.find({}) \
+    cursor = db[IMPACT_LOGS_COLLECTION].find({}) \
         .sort("created_at", -1) \
         .skip(skip) \
         .limit(page_size)
@@ -109,4 +142,117 @@ async def get_all_logs(
         "page": page,
         "page_size": page_size,
         "data": data
-    }
\ No newline at end of file
+    }
+
+@router.get("/analytics")
+async def get_analytics(
+    start: Optional[date] = Query(None, description="First day (inclusive), defaults to 30 days before end"),
+    end: Optional[date] = Query(None, description="Last day (inclusive), defaults to today (UTC)"),
+    current_admin: dict = Depends(get_current_admin)
+):
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=29)
+    
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must not be after end"
+        )
+    if (end - start).days >= MAX_ANALYTICS_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Range cannot exceed {MAX_ANALYTICS_DAYS} days"
+        )
+    
+    db = await get_database()
+    range_start, range_end = get_date_range(start, end)
+    # Archived months are gone from the live collection; reject rather than
+    # report them as empty
+    archived = [
+        run["_id"] for run in await archived_months(db)
+        if month_bounds(run["_id"])[0] < range_end and month_bounds(run["_id"])[1] > range_start
+    ]
+    if archived:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Range includes archived months ({', '.join(archived)}); "
+                   "per-user monthly totals for them are in impact_log_summaries"
+        )
+    
+    async def compute():
+        cursor = db[IMPACT_LOGS_COLLECTION].aggregate(build_analytics_pipeline(range_start, range_end))
+        results = await cursor.to_list(length=1)
+        analytics = format_analytics(results[0] if results else {})
+        analytics["start"] = start.isoformat()
+        analytics["end"] = end.isoformat()
+        analytics["generated_at"] = datetime.utcnow().isoformat()
+        return analytics
+    
+    return await analytics_cache.get_or_set(
+        f"{start.isoformat()}:{end.isoformat()}",
+        compute,
+        ttl=ANALYTICS_CACHE_TTL
+    )
+
+@router.get("/export")
+async def export_logs(
+    user_id: Optional[str] = Query(None),
+    start: Optional[datetime] = Query(None),
+    end: Optional[datetime] = Query(None),
+    current_admin: dict = Depends(get_current_admin)
+):
+    """Stream impact logs (live and archived) as NDJSON"""
+    db = await get_database()
+    start, end = to_naive_utc(start), to_naive_utc(end)
+    
+    async def lines():
+        logs = iter_logs_with_archive(user_id, start, end)
+        async for log in iter_rehydrated(db, logs):
+            yield export_line(log)
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.websocket("/feed")
+async def activity_feed(
+    websocket: WebSocket,
+    token: str = Query(...),
+    resume_after: Optional[str] = Query(None)
+):
+    """Push impact log and user events to admins as they happen.
+
+    Browsers cannot set headers on WebSockets, so the JWT comes as ?token=.
+    """
+    payload = decode_token(token)
+    user_id = payload.get("user_id") if payload else None
+    user = await load_user(user_id) if user_id and ObjectId.is_valid(user_id) else None
+    if user is None or user["role"] != "admin":
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    client = feed.subscribe(resume_after)
+    
+    async def send_events():
+        while True:
+            event = await client.queue.get()
+            await websocket.send_json(event)
+    
+    async def wait_for_disconnect():
+        # Admins never send anything; reading is how a closed socket is noticed
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+    
+    tasks = {asyncio.create_task(send_events()), asyncio.create_task(wait_for_disconnect())}
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            # A send to a socket that just closed fails with transport-specific
+            # errors; either way the client is gone
+            if not task.cancelled() and task.exception() is not None:
+                print(f"Admin feed client dropped: {task.exception()!r}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        feed.unsubscribe(client)
@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, status, Depends
 from app.schemas.user import UserSignup, UserLogin, Token, UserResponse
 from app.database import get_database
 from app.auth.jwt_handler import create_access_token
+from app.cache import get_cache
 from passlib.context import CryptContext
 from bson import ObjectId
 
@@ -38,6 +39,7 @@ async def signup(user_data: UserSignup):
     user_dict["updated_at"] = datetime.utcnow()
     
     result = await db.users.insert_one(user_dict)
+    await get_cache("counts").delete("users:all")
     
     # Create token
     access_token = create_access_token({"user_id": str(result.inserted_id)})
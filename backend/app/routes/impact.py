@@ -1,21 +1,37 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from app.schemas.impact import ImpactInput, ImpactResponse, ImpactHistory
+from fastapi.responses import StreamingResponse
+from app.schemas.impact import (
+    ImpactInput,
+    ImpactResponse,
+    ImpactHistory,
+    SimulationRequest,
+    SimulationResponse,
+)
 from app.auth.dependencies import get_current_user
-from app.database import get_database
+from app.database import get_database, IMPACT_LOGS_COLLECTION, insert_impact_log
 from app.utils.calculations import (
     calculate_carbon_footprint,
     calculate_water_score,
     calculate_energy_score,
     calculate_waste_score,
     get_overall_rating,
+    CAR_EMISSION,
+    DIET_EMISSIONS,
+    EMISSION_FACTORS_VERSION,
 )
-from app.utils.ai_service import generate_ai_tips, generate_ai_analysis  # NEW
+from app.utils.simulator import simulate_scenarios
+from app.utils.ai_service import get_cached_ai_tips, get_cached_ai_analysis
+from app.cache import get_cache
+from app.archive import iter_logs_with_archive, export_line, to_naive_utc
+from app.utils.text_catalog import rehydrate_logs, iter_rehydrated
 from datetime import datetime
 from bson import ObjectId
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 
 router = APIRouter()
+count_cache = get_cache("counts")
+COUNT_CACHE_TTL = 30  # seconds
 
 class ChatRequest(BaseModel):
     message: str
@@ -52,7 +68,7 @@ async def calculate_impact(
     overall_rating = get_overall_rating(carbon_score)
     
     # UPDATED: Use AI-powered tips
-    tips = generate_ai_tips(
+    tips = await get_cached_ai_tips(
         impact_data.transport_method,
         impact_data.transport_km,
         impact_data.electricity_kwh,
@@ -64,7 +80,7 @@ async def calculate_impact(
     )
     
     # NEW: Generate AI analysis
-    ai_analysis = generate_ai_analysis(
+    ai_analysis = await get_cached_ai_analysis(
         carbon_score,
         water_score,
         energy_score,
@@ -75,8 +91,6 @@ async def calculate_impact(
     )
     
     # Save to database
-    db = await get_database()
-    
     impact_log = {
         "user_id": current_user["id"],
         "transport_method": impact_data.transport_method,
@@ -92,13 +106,16 @@ async def calculate_impact(
         "overall_rating": overall_rating,
         "tips": tips,
         "ai_analysis": ai_analysis,  # NEW
+        "factor_version": EMISSION_FACTORS_VERSION,
         "created_at": datetime.utcnow()
     }
     
-    result = await db.impact_logs.insert_one(impact_log)
+    # Repeated tips / analysis text is stored as text catalog references
+    inserted_id = await insert_impact_log(impact_log)
+    await count_cache.delete(f"impact_logs:{current_user['id']}", "impact_logs:all")
     
     return ImpactResponse(
-        id=str(result.inserted_id),
+        id=str(inserted_id),
         carbon_score=carbon_score,
         water_score=water_score,
         energy_score=energy_score,
@@ -109,6 +126,49 @@ async def calculate_impact(
         created_at=impact_log["created_at"]
     )
 
+@router.post("/simulate", response_model=SimulationResponse)
+async def simulate_impact(
+    simulation: SimulationRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """What-if scenarios over the base input; read-only, no AI calls"""
+    base = simulation.base.dict()
+    transport_methods = simulation.transport_methods or [base["transport_method"]]
+    diet_types = simulation.diet_types or [base["diet_type"]]
+    
+    # The base input falls back to default factors like /calculate does;
+    # only values the caller explicitly sweeps must be known
+    unknown = [m for m in simulation.transport_methods or [] if m not in CAR_EMISSION] + \
+        [d for d in simulation.diet_types or [] if d not in DIET_EMISSIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown transport method or diet type: {', '.join(unknown)}"
+        )
+    
+    try:
+        result = simulate_scenarios(
+            base,
+            transport_methods,
+            diet_types,
+            simulation.transport_km_deltas or [0],
+            simulation.electricity_kwh_deltas or [0],
+            simulation.water_liters_deltas or [0],
+            simulation.waste_kg_deltas or [0],
+            simulation.days_per_week
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return SimulationResponse(
+        base=result["base"],
+        total_scenarios=result["total_scenarios"],
+        scenarios=result["scenarios"][:simulation.limit]
+    )
+
 @router.get("/history", response_model=ImpactHistory)
 async def get_impact_history(
     page: int = Query(1, ge=1),
@@ -118,16 +178,21 @@ async def get_impact_history(
     db = await get_database()
     
     # Count total documents
-    total = await db.impact_logs.count_documents({"user_id": current_user["id"]})
+    total = await count_cache.get_or_set(
+        f"impact_logs:{current_user['id']}",
+        lambda: db[IMPACT_LOGS_COLLECTION].count_documents({"user_id": current_user["id"]}),
+        ttl=COUNT_CACHE_TTL
+    )
     
     # Fetch paginated data
     skip = (page - 1) * page_size
-    cursor = db.impact_logs.find({"user_id": current_user["id"]}) \
+    cursor = db[IMPACT_LOGS_COLLECTION].find({"user_id": current_user["id"]}) \
         .sort("created_at", -1) \
         .skip(skip) \
         .limit(page_size)
     
     logs = await cursor.to_list(length=page_size)
+    logs = await rehydrate_logs(db, logs)
     
     data = [
         ImpactResponse(
@@ -137,7 +202,7 @@ async def get_impact_history(
             energy_score=log["energy_score"],
             waste_score=log["waste_score"],
             overall_rating=log["overall_rating"],
-            tips=log["tips"],
+            tips=log.get("tips", []),
             created_at=log["created_at"]
         )
         for log in logs
@@ -149,6 +214,24 @@ async def get_impact_history(
         page_size=page_size,
         data=data
     )
+
+@router.get("/export")
+async def export_impact_logs(
+    start: Optional[datetime] = Query(None),
+    end: Optional[datetime] = Query(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream the user's full history as NDJSON, including archived logs"""
+    db = await get_database()
+    start, end = to_naive_utc(start), to_naive_utc(end)
+    
+    async def lines():
+        logs = iter_logs_with_archive(current_user["id"], start, end)
+        async for log in iter_rehydrated(db, logs):
+            yield export_line(log)
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_assistant(
     chat_request: ChatRequest,
@@ -159,7 +242,7 @@ async def chat_with_assistant(
     db = await get_database()
     
     # Get user's latest impact data for context
-    latest_log = await db.impact_logs.find_one(
+    latest_log = await db[IMPACT_LOGS_COLLECTION].find_one(
         {"user_id": current_user["id"]},
         sort=[("created_at", -1)]
     )
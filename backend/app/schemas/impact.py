@@ -25,4 +25,36 @@ class ImpactHistory(BaseModel):
     total: int
     page: int
     page_size: int
-    data: List[ImpactResponse]
\ No newline at end of file
+    data: List[ImpactResponse]
+
+class SimulationRequest(BaseModel):
+    base: ImpactInput
+    transport_methods: Optional[List[str]] = Field(None, description="Defaults to the base transport_method")
+    diet_types: Optional[List[str]] = Field(None, description="Defaults to the base diet_type")
+    transport_km_deltas: List[float] = Field([0], description="Added to base transport_km")
+    electricity_kwh_deltas: List[float] = Field([0], description="Added to base electricity_kwh")
+    water_liters_deltas: List[float] = Field([0], description="Added to base water_liters")
+    waste_kg_deltas: List[float] = Field([0], description="Added to base waste_kg")
+    days_per_week: int = Field(7, ge=1, le=7, description="Days per week the scenario applies")
+    limit: int = Field(20, ge=1, le=500, description="Number of ranked scenarios to return")
+
+class ScenarioScores(BaseModel):
+    carbon_score: float
+    water_score: float
+    energy_score: float
+    waste_score: float
+    overall_rating: str
+
+class ScenarioResult(BaseModel):
+    inputs: ImpactInput
+    scores: ScenarioScores
+    carbon_savings: float
+    water_savings: float
+    energy_savings: float
+    waste_savings: float
+    weekly_carbon_savings: float
+
+class SimulationResponse(BaseModel):
+    base: ScenarioScores
+    total_scenarios: int
+    scenarios: List[ScenarioResult]
\ No newline at end of file
@@ -1,17 +1,44 @@
 import google.generativeai as genai
 import os
 from typing import List, Dict
+import hashlib
 import json
+from app.cache import get_cache
 
 # Configure Gemini
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
 
+# Identical inputs produce interchangeable Gemini output, so share it across workers
+ai_cache = get_cache("ai")
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", str(60 * 60 * 6)))  # seconds
+
 def get_ai_enabled() -> bool:
     """Check if AI is enabled"""
     return bool(GEMINI_API_KEY)
 
+def _cache_key(kind: str, *args) -> str:
+    digest = hashlib.sha1(json.dumps(args, default=str).encode()).hexdigest()
+    return f"{kind}:{digest}"
+
+def _fallback_tips(
+    transport_method: str,
+    transport_km: float,
+    electricity_kwh: float,
+    diet_type: str,
+    waste_kg: float,
+    carbon_score: float
+) -> List[str]:
+    from app.utils.calculations import generate_tips
+    return generate_tips(
+        transport_method, transport_km, electricity_kwh,
+        diet_type, waste_kg, carbon_score
+    )
+
+def _fallback_analysis(overall_rating: str, carbon_score: float) -> str:
+    return f"Your environmental rating is {overall_rating} with a carbon footprint of {carbon_score} kg CO2. Focus on your highest impact areas."
+
 def generate_ai_tips(
     transport_method: str,
     transport_km: float,
@@ -20,14 +47,18 @@ def generate_ai_tips(
     diet_type: str,
     waste_kg: float,
     carbon_score: float,
-    overall_rating: str
+    overall_rating: str,
+    raise_on_error: bool = False
 ) -> List[str]:
-    """Generate personalized tips using Gemini AI"""
+    """Generate personalized tips using Gemini AI.
+
+    With raise_on_error, Gemini failures propagate instead of falling back to
+    rule-based tips (used by the cached path so fallbacks are never cached).
+    """
     
     if not get_ai_enabled():
         # Fallback to rule-based tips
-        from app.utils.calculations import generate_tips
-        return generate_tips(
+        return _fallback_tips(
             transport_method, transport_km, electricity_kwh,
             diet_type, waste_kg, carbon_score
         )
@@ -70,9 +101,10 @@ Example: ["Tip 1", "Tip 2", "Tip 3", "Tip 4", "Tip 5"]"""
     
     except Exception as e:
         print(f"AI tip generation failed: {e}")
+        if raise_on_error:
+            raise
         # Fallback to rule-based tips
-        from app.utils.calculations import generate_tips
-        return generate_tips(
+        return _fallback_tips(
             transport_method, transport_km, electricity_kwh,
             diet_type, waste_kg, carbon_score
         )
@@ -84,9 +116,14 @@ def generate_ai_analysis(
     waste_score: float,
     overall_rating: str,
     transport_method: str,
-    diet_type: str
+    diet_type: str,
+    raise_on_error: bool = False
 ) -> str:
-    """Generate AI-powered environmental impact analysis"""
+    """Generate AI-powered environmental impact analysis.
+
+    With raise_on_error, Gemini failures propagate instead of returning the
+    generic fallback text.
+    """
     
     if not get_ai_enabled():
         return f"Your environmental rating is {overall_rating}. Focus on reducing your carbon footprint through sustainable transportation and energy conservation."
@@ -118,7 +155,9 @@ Keep it concise, encouraging, and actionable."""
     
     except Exception as e:
         print(f"AI analysis generation failed: {e}")
-        return f"Your environmental rating is {overall_rating} with a carbon footprint of {carbon_score} kg CO2. Focus on your highest impact areas."
+        if raise_on_error:
+            raise
+        return _fallback_analysis(overall_rating, carbon_score)
 
 def generate_comparison_insight(user_carbon: float, avg_carbon: float = 12.0) -> str:
     """Generate AI comparison with average person"""
@@ -173,4 +212,62 @@ Provide a helpful, actionable answer focused on environmental sustainability."""
     
     except Exception as e:
         print(f"AI chat failed: {e}")
-        return "I'm having trouble processing your question. Please try again."
\ No newline at end of file
+        return "I'm having trouble processing your question. Please try again."
+
+async def get_cached_ai_tips(
+    transport_method: str,
+    transport_km: float,
+    electricity_kwh: float,
+    water_liters: float,
+    diet_type: str,
+    waste_kg: float,
+    carbon_score: float,
+    overall_rating: str
+) -> List[str]:
+    """generate_ai_tips backed by the shared cache"""
+    args = (
+        transport_method, transport_km, electricity_kwh, water_liters,
+        diet_type, waste_kg, carbon_score, overall_rating
+    )
+    if not get_ai_enabled():
+        return generate_ai_tips(*args)
+    
+    try:
+        return await ai_cache.get_or_set(
+            _cache_key("tips", *args),
+            lambda: generate_ai_tips(*args, raise_on_error=True),
+            ttl=AI_CACHE_TTL
+        )
+    except Exception:
+        # Serve the rule-based tips for this request only; never cache them
+        return _fallback_tips(
+            transport_method, transport_km, electricity_kwh,
+            diet_type, waste_kg, carbon_score
+        )
+
+async def get_cached_ai_analysis(
+    carbon_score: float,
+    water_score: float,
+    energy_score: float,
+    waste_score: float,
+    overall_rating: str,
+    transport_method: str,
+    diet_type: str
+) -> str:
+    """generate_ai_analysis backed by the shared cache"""
+    args = (
+        carbon_score, water_score, energy_score, waste_score,
+        overall_rating, transport_method, diet_type
+    )
+    if not get_ai_enabled():
+        return generate_ai_analysis(*args)
+    
+    try:
+        return await ai_cache.get_or_set(
+            _cache_key("analysis", *args),
+            lambda: generate_ai_analysis(*args, raise_on_error=True),
+            ttl=AI_CACHE_TTL
+        )
+    except Exception:
+        # Serve the generic analysis for this request only; never cache it
+        return _fallback_analysis(overall_rating, carbon_score)
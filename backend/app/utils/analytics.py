@@ -0,0 +1,83 @@
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List
+
+SCORE_FIELDS = ["carbon_score", "water_score", "energy_score", "waste_score"]
+
+def get_date_range(start: date, end: date):
+    """Convert inclusive calendar dates into a [start, end) datetime range"""
+    return datetime.combine(start, time.min), datetime.combine(end + timedelta(days=1), time.min)
+
+def _score_averages() -> Dict:
+    averages = {f"avg_{field}": {"$avg": f"${field}"} for field in SCORE_FIELDS}
+    averages["count"] = {"$sum": 1}
+    return averages
+
+def build_analytics_pipeline(start: datetime, end: datetime) -> List[Dict]:
+    """Single-pass $facet aggregation over impact_logs in [start, end)"""
+    return [
+        {"$match": {"created_at": {"$gte": start, "$lt": end}}},
+        {"$project": {
+            "_id": 0,
+            "overall_rating": 1,
+            "transport_method": 1,
+            "diet_type": 1,
+            "created_at": 1,
+            **{field: 1 for field in SCORE_FIELDS}
+        }},
+        {"$facet": {
+            "rating_distribution": [
+                {"$group": {"_id": "$overall_rating", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}}
+            ],
+            "by_transport_method": [
+                {"$group": {"_id": "$transport_method", **_score_averages()}},
+                {"$sort": {"count": -1}}
+            ],
+            "by_diet_type": [
+                {"$group": {"_id": "$diet_type", **_score_averages()}},
+                {"$sort": {"count": -1}}
+            ],
+            "daily_submissions": [
+                {"$group": {
+                    "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+                    "count": {"$sum": 1},
+                    "avg_carbon_score": {"$avg": "$carbon_score"}
+                }},
+                {"$sort": {"_id": 1}}
+            ],
+            "totals": [
+                {"$group": {"_id": None, **_score_averages()}}
+            ]
+        }}
+    ]
+
+def _format_group(row: Dict, key: str) -> Dict:
+    formatted = {key: row["_id"], "count": row["count"]}
+    for name, value in row.items():
+        if name.startswith("avg_"):
+            formatted[name] = round(value, 2) if value is not None else None
+    return formatted
+
+def format_analytics(result: Dict) -> Dict:
+    """Shape the raw $facet output into the API response"""
+    totals = result.get("totals") or [{"_id": None, "count": 0}]
+    return {
+        "total_submissions": totals[0]["count"],
+        "averages": {
+            f"avg_{field}": round(totals[0][f"avg_{field}"], 2)
+            if totals[0].get(f"avg_{field}") is not None else None
+            for field in SCORE_FIELDS
+        },
+        "rating_distribution": {
+            row["_id"]: row["count"] for row in result.get("rating_distribution", [])
+        },
+        "by_transport_method": [
+            _format_group(row, "transport_method") for row in result.get("by_transport_method", [])
+        ],
+        "by_diet_type": [
+            _format_group(row, "diet_type") for row in result.get("by_diet_type", [])
+        ],
+        "daily_submissions": [
+            _format_group(row, "date") for row in result.get("daily_submissions", [])
+        ]
+    }
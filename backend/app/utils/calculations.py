@@ -1,53 +1,84 @@
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
+import json
+import os
+import re
 
-# Emission factors (kg CO2 per unit)
-CAR_EMISSION = {
-    "car": 0.21,      # kg CO2 per km
-    "bus": 0.08,      # kg CO2 per km
-    "bike": 0,        # kg CO2 per km
-    "walk": 0,        # kg CO2 per km
-    "ev": 0.05        # kg CO2 per km
-}
+# Emission factor tables are versioned JSON files in app/data/emission_factors.
+# Every impact log records the factor_version it was scored with; when a new
+# version ships, `python -m app.recompute_scores` rescores stored logs.
+FACTORS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "emission_factors")
+LEGACY_FACTOR_VERSION = "v1"  # logs written before versioning used these factors
+VERSION_PATTERN = re.compile(r"^v(\d+)$")
 
-DIET_EMISSIONS = {
-    "veg": 2.0,           # kg CO2 per day
-    "mixed": 3.5,         # kg CO2 per day
-    "heavy_meat": 7.0     # kg CO2 per day
-}
+def _load_factor_tables() -> Dict[str, Dict]:
+    tables = {}
+    for filename in sorted(os.listdir(FACTORS_DIR)):
+        if filename.endswith(".json"):
+            with open(os.path.join(FACTORS_DIR, filename)) as f:
+                table = json.load(f)
+            version = table.get("version")
+            if not isinstance(version, str) or not VERSION_PATTERN.match(version):
+                raise RuntimeError(
+                    f"Emission factor table {filename} has invalid version {version!r}; "
+                    "expected 'v' followed by an integer, e.g. 'v2'"
+                )
+            tables[version] = table
+    return tables
+
+def _version_key(version: str):
+    return int(VERSION_PATTERN.match(version).group(1))
 
-ELECTRICITY_EMISSION = 0.5  # kg CO2 per kWh
-WASTE_EMISSION = 0.4        # kg CO2 per kg
+EMISSION_FACTOR_TABLES = _load_factor_tables()
+EMISSION_FACTORS_VERSION = os.getenv(
+    "EMISSION_FACTORS_VERSION",
+    max(EMISSION_FACTOR_TABLES, key=_version_key)
+)
+if EMISSION_FACTORS_VERSION not in EMISSION_FACTOR_TABLES:
+    raise RuntimeError(f"Unknown EMISSION_FACTORS_VERSION '{EMISSION_FACTORS_VERSION}'")
+
+def get_emission_factors(version: Optional[str] = None) -> Dict:
+    """Factor table for version (default: the active EMISSION_FACTORS_VERSION)"""
+    return EMISSION_FACTOR_TABLES[version or EMISSION_FACTORS_VERSION]
+
+# Active factors (kg CO2 per unit)
+_active = get_emission_factors()
+CAR_EMISSION = _active["transport_kg_co2_per_km"]
+DIET_EMISSIONS = _active["diet_kg_co2_per_day"]
+ELECTRICITY_EMISSION = _active["electricity_kg_co2_per_kwh"]
+WASTE_EMISSION = _active["waste_kg_co2_per_kg"]
 
 def calculate_carbon_footprint(
     transport_method: str,
     transport_km: float,
     electricity_kwh: float,
     diet_type: str,
-    waste_kg: float
+    waste_kg: float,
+    factors: Optional[Dict] = None
 ) -> float:
     """Calculate total carbon footprint in kg CO2"""
-    transport_carbon = CAR_EMISSION.get(transport_method, 0.21) * transport_km
-    electricity_carbon = electricity_kwh * ELECTRICITY_EMISSION
-    diet_carbon = DIET_EMISSIONS.get(diet_type, 3.5)
-    waste_carbon = waste_kg * WASTE_EMISSION
+    factors = factors or _active
+    transport = factors["transport_kg_co2_per_km"]
+    diet = factors["diet_kg_co2_per_day"]
+    transport_carbon = transport.get(transport_method, transport[factors["default_transport_method"]]) * transport_km
+    electricity_carbon = electricity_kwh * factors["electricity_kg_co2_per_kwh"]
+    diet_carbon = diet.get(diet_type, diet[factors["default_diet_type"]])
+    waste_carbon = waste_kg * factors["waste_kg_co2_per_kg"]
     
     total_carbon = transport_carbon + electricity_carbon + diet_carbon + waste_carbon
     return round(total_carbon, 2)
 
-def calculate_water_score(water_liters: float, diet_type: str) -> float:
+def calculate_water_score(water_liters: float, diet_type: str, factors: Optional[Dict] = None) -> float:
     """Calculate water footprint in liters"""
-    diet_water = {
-        "veg": 1500,
-        "mixed": 3000,
-        "heavy_meat": 5000
-    }
+    factors = factors or _active
+    diet_water = factors["diet_water_liters_per_day"]
     
-    total_water = water_liters + diet_water.get(diet_type, 3000)
+    total_water = water_liters + diet_water.get(diet_type, diet_water[factors["default_diet_type"]])
     return round(total_water, 2)
 
-def calculate_energy_score(electricity_kwh: float, transport_km: float) -> float:
+def calculate_energy_score(electricity_kwh: float, transport_km: float, factors: Optional[Dict] = None) -> float:
     """Calculate energy score"""
-    energy_score = electricity_kwh + (transport_km * 0.5)
+    factors = factors or _active
+    energy_score = electricity_kwh + (transport_km * factors["transport_energy_per_km"])
     return round(energy_score, 2)
 
 def calculate_waste_score(waste_kg: float) -> float:
@@ -67,6 +98,44 @@ def get_overall_rating(carbon_score: float) -> str:
     else:
         return "Critical"
 
+def score_inputs(inputs: Dict, factors: Optional[Dict] = None) -> Dict:
+    """Score one set of inputs exactly like /impact/calculate does"""
+    carbon_score = calculate_carbon_footprint(
+        inputs["transport_method"],
+        inputs["transport_km"],
+        inputs["electricity_kwh"],
+        inputs["diet_type"],
+        inputs["waste_kg"],
+        factors
+    )
+    return {
+        "carbon_score": carbon_score,
+        "water_score": calculate_water_score(inputs["water_liters"], inputs["diet_type"], factors),
+        "energy_score": calculate_energy_score(inputs["electricity_kwh"], inputs["transport_km"], factors),
+        "waste_score": calculate_waste_score(inputs["waste_kg"]),
+        "overall_rating": get_overall_rating(carbon_score)
+    }
+
+# Rule-based tips keyed by stable IDs; the IDs are what impact logs store
+# (see app.utils.text_catalog), so never renumber or reuse them
+RULE_TIPS = {
+    "rule:transport_carpool": "Consider using public transport or carpooling to reduce emissions",
+    "rule:transport_short_trips": "Try cycling or walking for short distances under 5km",
+    "rule:transport_switch_ev": "Switch to electric vehicles or use public transport twice a week",
+    "rule:electricity_unused": "Reduce electricity usage by turning off unused appliances",
+    "rule:electricity_led": "Consider switching to LED bulbs and energy-efficient appliances",
+    "rule:electricity_unplug": "Unplug devices when not in use to save energy",
+    "rule:diet_red_meat": "Reduce red meat consumption to 2-3 times per week",
+    "rule:diet_plant_based": "Try incorporating more plant-based meals into your diet",
+    "rule:diet_meat_free_day": "Consider having one meat-free day per week",
+    "rule:waste_recycling": "Increase recycling efforts and reduce single-use plastics",
+    "rule:waste_compost": "Compost organic waste to reduce landfill contribution",
+    "rule:waste_segregation": "Practice proper waste segregation for better recycling",
+    "rule:overall_high_carbon": "Your carbon footprint is high. Focus on sustainable transportation and energy use",
+    "rule:default_maintain": "Great job! Maintain your eco-friendly habits",
+    "rule:default_share": "Share your sustainable practices with friends and family",
+}
+
 def generate_tips(
     transport_method: str,
     transport_km: float,
@@ -80,41 +149,41 @@ def generate_tips(
     
     # Transport tips
     if transport_method == "car" and transport_km > 20:
-        tips.append("Consider using public transport or carpooling to reduce emissions")
+        tips.append(RULE_TIPS["rule:transport_carpool"])
     elif transport_method == "car":
-        tips.append("Try cycling or walking for short distances under 5km")
+        tips.append(RULE_TIPS["rule:transport_short_trips"])
     
     if transport_method not in ["bike", "walk", "ev"] and transport_km > 10:
-        tips.append("Switch to electric vehicles or use public transport twice a week")
+        tips.append(RULE_TIPS["rule:transport_switch_ev"])
     
     # Electricity tips
     if electricity_kwh > 10:
-        tips.append("Reduce electricity usage by turning off unused appliances")
-        tips.append("Consider switching to LED bulbs and energy-efficient appliances")
+        tips.append(RULE_TIPS["rule:electricity_unused"])
+        tips.append(RULE_TIPS["rule:electricity_led"])
     elif electricity_kwh > 5:
-        tips.append("Unplug devices when not in use to save energy")
+        tips.append(RULE_TIPS["rule:electricity_unplug"])
     
     # Diet tips
     if diet_type == "heavy_meat":
-        tips.append("Reduce red meat consumption to 2-3 times per week")
-        tips.append("Try incorporating more plant-based meals into your diet")
+        tips.append(RULE_TIPS["rule:diet_red_meat"])
+        tips.append(RULE_TIPS["rule:diet_plant_based"])
     elif diet_type == "mixed":
-        tips.append("Consider having one meat-free day per week")
+        tips.append(RULE_TIPS["rule:diet_meat_free_day"])
     
     # Waste tips
     if waste_kg > 2:
-        tips.append("Increase recycling efforts and reduce single-use plastics")
-        tips.append("Compost organic waste to reduce landfill contribution")
+        tips.append(RULE_TIPS["rule:waste_recycling"])
+        tips.append(RULE_TIPS["rule:waste_compost"])
     elif waste_kg > 1:
-        tips.append("Practice proper waste segregation for better recycling")
+        tips.append(RULE_TIPS["rule:waste_segregation"])
     
     # Overall tips
     if carbon_score > 15:
-        tips.append("Your carbon footprint is high. Focus on sustainable transportation and energy use")
+        tips.append(RULE_TIPS["rule:overall_high_carbon"])
     
     # Default tip if no specific issues
     if not tips:
-        tips.append("Great job! Maintain your eco-friendly habits")
-        tips.append("Share your sustainable practices with friends and family")
+        tips.append(RULE_TIPS["rule:default_maintain"])
+        tips.append(RULE_TIPS["rule:default_share"])
     
     return tips[:5]  # Return max 5 tips
\ No newline at end of file
@@ -0,0 +1,59 @@
+from itertools import product
+from typing import Dict, List
+from app.utils.calculations import score_inputs
+
+MAX_SCENARIOS = 5000
+
+def _apply_deltas(base_value: float, deltas: List[float]) -> List[float]:
+    # Deltas that would go negative clamp to zero; duplicates collapse
+    return sorted({round(max(0.0, base_value + delta), 4) for delta in deltas})
+
+def simulate_scenarios(
+    base: Dict,
+    transport_methods: List[str],
+    diet_types: List[str],
+    transport_km_deltas: List[float],
+    electricity_kwh_deltas: List[float],
+    water_liters_deltas: List[float],
+    waste_kg_deltas: List[float],
+    days_per_week: int = 7
+) -> Dict:
+    """Evaluate every combination of the sweeps and rank by carbon saved.
+
+    Pure computation over the emission tables: no database access and no AI
+    calls, so it is safe to call as often as the UI likes.
+    """
+    axes = {
+        "transport_method": list(dict.fromkeys(transport_methods)),
+        "diet_type": list(dict.fromkeys(diet_types)),
+        "transport_km": _apply_deltas(base["transport_km"], transport_km_deltas),
+        "electricity_kwh": _apply_deltas(base["electricity_kwh"], electricity_kwh_deltas),
+        "water_liters": _apply_deltas(base["water_liters"], water_liters_deltas),
+        "waste_kg": _apply_deltas(base["waste_kg"], waste_kg_deltas),
+    }
+    total = 1
+    for values in axes.values():
+        total *= len(values)
+    if total > MAX_SCENARIOS:
+        raise ValueError(f"Too many scenarios ({total}); the limit is {MAX_SCENARIOS}")
+
+    base_scores = score_inputs(base)
+
+    scenarios = []
+    names = list(axes)
+    for combination in product(*axes.values()):
+        inputs = dict(zip(names, combination))
+        scores = score_inputs(inputs)
+        carbon_savings = round(base_scores["carbon_score"] - scores["carbon_score"], 2)
+        scenarios.append({
+            "inputs": inputs,
+            "scores": scores,
+            "carbon_savings": carbon_savings,
+            "water_savings": round(base_scores["water_score"] - scores["water_score"], 2),
+            "energy_savings": round(base_scores["energy_score"] - scores["energy_score"], 2),
+            "waste_savings": round(base_scores["waste_score"] - scores["waste_score"], 2),
+            "weekly_carbon_savings": round(carbon_savings * days_per_week, 2)
+        })
+
+    scenarios.sort(key=lambda scenario: (-scenario["carbon_savings"], -scenario["water_savings"]))
+    return {"base": base_scores, "total_scenarios": total, "scenarios": scenarios}
@@ -0,0 +1,135 @@
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+from pymongo import UpdateOne
+import hashlib
+import os
+
+from app.utils.calculations import RULE_TIPS
+
+# Content-addressed store for tip and analysis text that repeats. Rule-based
+# tips are always stored as their stable "rule:*" IDs from calculations.RULE_TIPS.
+# Other text (Gemini output) is catalogued under "h:" + a SHA-256 prefix once
+# this worker has seen it before; one-off text stays inline in the log, since
+# a catalog entry per log would save nothing. Entries are immutable and never
+# deleted, since archived logs may still reference them.
+TEXT_CATALOG_CACHE_SIZE = int(os.getenv("TEXT_CATALOG_CACHE_SIZE", "50000"))
+REHYDRATE_BATCH_SIZE = 200
+
+_RULE_IDS = {text: text_id for text_id, text in RULE_TIPS.items()}
+_cache: "OrderedDict[str, str]" = OrderedDict()
+# IDs of text seen once and stored inline; a second sighting catalogues it
+_seen: "OrderedDict[str, bool]" = OrderedDict()
+
+def catalog_id(text: str) -> str:
+    rule_id = _RULE_IDS.get(text)
+    if rule_id is not None:
+        return rule_id
+    return "h:" + hashlib.sha256(text.encode("utf-8")).hexdigest()[:24]
+
+def _remember(entry_id: str, text: str):
+    _cache[entry_id] = text
+    _cache.move_to_end(entry_id)
+    while len(_cache) > TEXT_CATALOG_CACHE_SIZE:
+        _cache.popitem(last=False)
+
+def _lookup(entry_id: str) -> Optional[str]:
+    if entry_id in RULE_TIPS:
+        return RULE_TIPS[entry_id]
+    text = _cache.get(entry_id)
+    if text is not None:
+        _cache.move_to_end(entry_id)
+    return text
+
+def _catalog_ref(text: str, new_entries: Dict[str, str]) -> Optional[str]:
+    """Catalog ID to store instead of text, or None to keep the text inline"""
+    entry_id = catalog_id(text)
+    if entry_id in new_entries or _lookup(entry_id) is not None:
+        return entry_id
+    if entry_id in _seen:
+        new_entries[entry_id] = text
+        return entry_id
+    _seen[entry_id] = True
+    while len(_seen) > TEXT_CATALOG_CACHE_SIZE:
+        _seen.popitem(last=False)
+    return None
+
+async def _store_entries(database, entries: Dict[str, str]):
+    if not entries:
+        return
+    await database.text_catalog.bulk_write([
+        UpdateOne({"_id": entry_id}, {"$setOnInsert": {"text": text}}, upsert=True)
+        for entry_id, text in entries.items()
+    ], ordered=False)
+    for entry_id, text in entries.items():
+        _remember(entry_id, text)
+
+async def compact_log_texts(database, logs: List[dict]) -> List[dict]:
+    """Replace repeated tips / ai_analysis text in log documents with catalog IDs.
+
+    Tips are replaced as a whole (tip_ids) only if every tip is catalogued.
+    New catalog entries are stored with one bulk_write for all logs, before
+    the logs themselves are written.
+    """
+    new_entries: Dict[str, str] = {}
+    for log in logs:
+        tips = log.get("tips")
+        if tips:
+            ids = [_catalog_ref(str(tip), new_entries) for tip in tips]
+            if None not in ids:
+                del log["tips"]
+                log["tip_ids"] = ids
+        ai_analysis = log.get("ai_analysis")
+        if ai_analysis:
+            entry_id = _catalog_ref(str(ai_analysis), new_entries)
+            if entry_id is not None:
+                del log["ai_analysis"]
+                log["ai_analysis_id"] = entry_id
+    await _store_entries(database, new_entries)
+    return logs
+
+async def resolve_texts(database, ids: Iterable[str]) -> Dict[str, str]:
+    """Map IDs to text, loading any not yet in the in-memory catalog"""
+    resolved = {}
+    missing = []
+    for entry_id in set(ids):
+        text = _lookup(entry_id)
+        if text is None:
+            missing.append(entry_id)
+        else:
+            resolved[entry_id] = text
+
+    if missing:
+        async for entry in database.text_catalog.find({"_id": {"$in": missing}}):
+            _remember(entry["_id"], entry["text"])
+            resolved[entry["_id"]] = entry["text"]
+
+    return resolved
+
+async def rehydrate_logs(database, logs: List[dict]) -> List[dict]:
+    """Fill tips / ai_analysis back in from catalog IDs (legacy logs pass through)"""
+    ids = []
+    for log in logs:
+        ids.extend(log.get("tip_ids", []))
+        if log.get("ai_analysis_id"):
+            ids.append(log["ai_analysis_id"])
+    catalog = await resolve_texts(database, ids) if ids else {}
+
+    for log in logs:
+        if "tip_ids" in log:
+            log["tips"] = [catalog[i] for i in log.pop("tip_ids") if i in catalog]
+        if "ai_analysis_id" in log:
+            log["ai_analysis"] = catalog.get(log.pop("ai_analysis_id"))
+    return logs
+
+async def iter_rehydrated(database, logs: AsyncIterator[dict], batch_size: int = REHYDRATE_BATCH_SIZE) -> AsyncIterator[dict]:
+    """Rehydrate a stream of logs in batches so a cold catalog costs one query per batch"""
+    batch = []
+    async for log in logs:
+        batch.append(log)
+        if len(batch) >= batch_size:
+            for rehydrated in await rehydrate_logs(database, batch):
+                yield rehydrated
+            batch = []
+    if batch:
+        for rehydrated in await rehydrate_logs(database, batch):
+            yield rehydrated
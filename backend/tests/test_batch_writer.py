@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from app.batch_writer import GroupCommitWriter
+
+class FakeCollection:
+    """Records insert_many calls; optionally fails or stalls them"""
+
+    def __init__(self, error=None, delay: float = 0):
+        self.batches = []
+        self.error = error
+        self.delay = delay
+
+    async def insert_many(self, documents, ordered=True):
+        self.batches.append([document["_id"] for document in documents])
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+
+def make_writer(collection, **kwargs):
+    async def get_collection():
+        return collection
+    return GroupCommitWriter(get_collection, **kwargs)
+
+async def insert_all(writer, count):
+    return await asyncio.gather(
+        *[writer.insert({"n": n}) for n in range(count)],
+        return_exceptions=True
+    )
+
+def test_concurrent_inserts_share_one_batch():
+    async def scenario():
+        collection = FakeCollection()
+        writer = make_writer(collection, max_batch=10, max_delay_ms=5)
+        results = await insert_all(writer, 3)
+        return collection, results
+
+    collection, results = asyncio.run(scenario())
+    assert len(collection.batches) == 1
+    assert results == collection.batches[0]
+
+def test_full_batch_flushes_without_waiting_for_delay():
+    async def scenario():
+        collection = FakeCollection()
+        writer = make_writer(collection, max_batch=2, max_delay_ms=10_000)
+        return collection, await asyncio.wait_for(insert_all(writer, 4), 1)
+
+    collection, results = asyncio.run(scenario())
+    assert [len(batch) for batch in collection.batches] == [2, 2]
+    assert results == collection.batches[0] + collection.batches[1]
+
+def test_write_errors_fail_only_their_document():
+    error = BulkWriteError({
+        "writeErrors": [{"index": 1, "code": 11000, "errmsg": "duplicate key"}],
+        "writeConcernErrors": [],
+        "nInserted": 2,
+    })
+
+    async def scenario():
+        collection = FakeCollection(error=error)
+        writer = make_writer(collection, max_batch=10, max_delay_ms=5)
+        return collection, await insert_all(writer, 3)
+
+    collection, results = asyncio.run(scenario())
+    ids = collection.batches[0]
+    assert results[0] == ids[0]
+    assert isinstance(results[1], BulkWriteError)
+    assert results[1].details["writeErrors"][0]["code"] == 11000
+    assert results[2] == ids[2]
+
+def test_write_concern_error_fails_whole_batch():
+    error = BulkWriteError({
+        "writeErrors": [],
+        "writeConcernErrors": [{"code": 64, "errmsg": "waiting for replication timed out"}],
+        "nInserted": 3,
+    })
+
+    async def scenario():
+        writer = make_writer(FakeCollection(error=error), max_batch=10, max_delay_ms=5)
+        return await insert_all(writer, 3)
+
+    results = asyncio.run(scenario())
+    assert all(result is error for result in results)
+
+def test_prepare_runs_once_per_batch_and_its_failure_fails_the_batch():
+    prepared = []
+
+    async def prepare(documents):
+        prepared.append(len(documents))
+        if len(prepared) > 1:
+            raise RuntimeError("catalog write failed")
+
+    async def scenario():
+        collection = FakeCollection()
+        writer = make_writer(collection, max_batch=10, max_delay_ms=5, prepare=prepare)
+        first = await insert_all(writer, 3)
+        second = await insert_all(writer, 2)
+        return collection, first, second
+
+    collection, first, second = asyncio.run(scenario())
+    assert prepared == [3, 2]
+    assert first == collection.batches[0]
+    assert len(collection.batches) == 1
+    assert all(isinstance(result, RuntimeError) for result in second)
+
+def test_cancelled_caller_does_not_break_the_batch():
+    async def scenario():
+        collection = FakeCollection(delay=0.05)
+        writer = make_writer(collection, max_batch=10, max_delay_ms=5)
+        cancelled = asyncio.create_task(writer.insert({"n": 0}))
+        kept = asyncio.create_task(writer.insert({"n": 1}))
+        await asyncio.sleep(0.02)
+        cancelled.cancel()
+        return collection, await kept, cancelled
+
+    collection, kept_id, cancelled = asyncio.run(scenario())
+    assert kept_id == collection.batches[0][1]
+    assert cancelled.cancelled()
+
+def test_close_timeout_does_not_cancel_in_flight_batches():
+    async def scenario():
+        collection = FakeCollection(delay=0.2)
+        writer = make_writer(collection, max_batch=10, max_delay_ms=5)
+        pending = asyncio.create_task(insert_all(writer, 3))
+        await asyncio.sleep(0.01)
+        await writer.close(timeout=0.05)
+        return collection, await pending
+
+    collection, results = asyncio.run(scenario())
+    assert results == collection.batches[0]
+
+def test_insert_after_close_is_rejected():
+    async def scenario():
+        writer = make_writer(FakeCollection())
+        await writer.close()
+        await writer.insert({"n": 0})
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(scenario())
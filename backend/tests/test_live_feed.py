@@ -0,0 +1,145 @@
+import asyncio
+
+from pymongo.errors import OperationFailure
+
+from app import live_feed
+from app.live_feed import ChangeFeed, RESYNC
+
+class FakeOplog:
+    """Change events with increasing hex resume tokens"""
+
+    def __init__(self):
+        self.changes = []
+
+    def insert_user(self):
+        n = len(self.changes)
+        self.changes.append({
+            "_id": {"_data": f"{n:08X}"},
+            "operationType": "insert",
+            "ns": {"coll": "users"},
+            "documentKey": {"_id": n},
+            "fullDocument": {"email": f"user{n}@example.com"},
+        })
+        return self.changes[-1]["_id"]["_data"]
+
+class FakeStream:
+    def __init__(self, oplog, position):
+        self.oplog = oplog
+        self.position = position
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def try_next(self):
+        await asyncio.sleep(0.001)
+        if self.position < len(self.oplog.changes):
+            self.position += 1
+            return self.oplog.changes[self.position - 1]
+        return None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            change = await self.try_next()
+            if change is not None:
+                return change
+
+class FakeDatabase:
+    def __init__(self, oplog):
+        self.oplog = oplog
+        self.watches = 0
+
+    def watch(self, pipeline, resume_after=None):
+        self.watches += 1
+        if resume_after is None:
+            return FakeStream(self.oplog, len(self.oplog.changes))
+        tokens = [change["_id"]["_data"] for change in self.oplog.changes]
+        if resume_after["_data"] not in tokens:
+            raise OperationFailure("resume point no longer in the oplog", code=286)
+        return FakeStream(self.oplog, tokens.index(resume_after["_data"]) + 1)
+
+def use_database(monkeypatch, database):
+    async def get_database():
+        return database
+    monkeypatch.setattr(live_feed, "get_database", get_database)
+
+def drain(client):
+    events = []
+    while not client.queue.empty():
+        events.append(client.queue.get_nowait())
+    return events
+
+def tokens(events):
+    return [event.get("resume_token", event["type"]) for event in events]
+
+def test_unknown_token_catches_up_from_the_oplog(monkeypatch):
+    oplog = FakeOplog()
+    use_database(monkeypatch, FakeDatabase(oplog))
+    missed_from = [oplog.insert_user() for _ in range(5)][1]
+
+    async def scenario():
+        # A worker that never saw these events, e.g. after a reconnect
+        feed = ChangeFeed()
+        client = feed.subscribe(missed_from)
+        await asyncio.sleep(0.05)
+        live = [oplog.insert_user() for _ in range(2)]
+        await asyncio.sleep(0.05)
+        await feed.stop()
+        return client, live
+
+    client, live = asyncio.run(scenario())
+    assert tokens(drain(client)) == [f"{n:08X}" for n in range(2, 5)] + live
+
+def test_token_in_buffer_replays_from_memory(monkeypatch):
+    oplog = FakeOplog()
+    database = FakeDatabase(oplog)
+    use_database(monkeypatch, database)
+
+    async def scenario():
+        feed = ChangeFeed()
+        first = feed.subscribe()
+        await asyncio.sleep(0.01)
+        sent = [oplog.insert_user() for _ in range(3)]
+        await asyncio.sleep(0.05)
+        second = feed.subscribe(sent[0])
+        await feed.stop()
+        return first, second, sent
+
+    first, second, sent = asyncio.run(scenario())
+    assert tokens(drain(first)) == sent
+    assert tokens(drain(second)) == sent[1:]
+    assert database.watches == 1
+
+def test_expired_token_resyncs(monkeypatch):
+    oplog = FakeOplog()
+    use_database(monkeypatch, FakeDatabase(oplog))
+
+    async def scenario():
+        feed = ChangeFeed()
+        client = feed.subscribe("0000FFFF")
+        await asyncio.sleep(0.02)
+        await feed.stop()
+        return client
+
+    assert drain(asyncio.run(scenario())) == [RESYNC]
+
+def test_last_client_leaving_stops_the_shared_stream(monkeypatch):
+    use_database(monkeypatch, FakeDatabase(FakeOplog()))
+
+    async def scenario():
+        feed = ChangeFeed()
+        client = feed.subscribe()
+        await asyncio.sleep(0.01)
+        watcher = feed._task
+        feed.unsubscribe(client)
+        await asyncio.sleep(0.01)
+        return feed, watcher
+
+    feed, watcher = asyncio.run(scenario())
+    assert watcher.cancelled()
+    assert feed._task is None
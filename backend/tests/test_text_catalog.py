@@ -0,0 +1,42 @@
+import asyncio
+
+from pymongo import UpdateOne
+
+from app.utils import text_catalog
+from app.utils.calculations import RULE_TIPS
+
+class FakeCatalog:
+    def __init__(self):
+        self.writes = []
+
+    async def bulk_write(self, requests, ordered=True):
+        self.writes.append(requests)
+
+class FakeDatabase:
+    def __init__(self):
+        self.text_catalog = FakeCatalog()
+
+def compact(database, logs):
+    return asyncio.run(text_catalog.compact_log_texts(database, logs))
+
+def test_rule_tips_become_rule_ids_without_writes():
+    database = FakeDatabase()
+    rule_id, text = next(iter(RULE_TIPS.items()))
+    [log] = compact(database, [{"tips": [text]}])
+    assert log == {"tip_ids": [rule_id]}
+    assert database.text_catalog.writes == []
+
+def test_one_off_text_stays_inline_and_repeats_are_catalogued_once_per_batch():
+    database = FakeDatabase()
+    first = compact(database, [{"tips": ["Walk more"], "ai_analysis": "Score 12.3"}])
+    assert first == [{"tips": ["Walk more"], "ai_analysis": "Score 12.3"}]
+    assert database.text_catalog.writes == []
+
+    repeats = compact(database, [{"tips": ["Walk more"]}, {"tips": ["Walk more"]}])
+    entry_id = text_catalog.catalog_id("Walk more")
+    assert repeats == [{"tip_ids": [entry_id]}, {"tip_ids": [entry_id]}]
+    stored = [UpdateOne({"_id": entry_id}, {"$setOnInsert": {"text": "Walk more"}}, upsert=True)]
+    assert database.text_catalog.writes == [stored]
+
+    compact(database, [{"tips": ["Walk more"]}])
+    assert database.text_catalog.writes == [stored]
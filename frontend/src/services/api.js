@@ -27,6 +27,10 @@ export const calculateImpact = (data) => api.post('/impact/calculate', data);
 export const getHistory = (page = 1, pageSize = 10) => 
   api.get(`/impact/history?page=${page}&page_size=${pageSize}`);
 
+export const simulateImpact = (data) => api.post('/impact/simulate', data);
+export const exportHistory = () =>
+  api.get('/impact/export', { responseType: 'blob' });
+
 // AI Chat API - NEW
 export const chatWithAI = (message) => api.post('/impact/chat', { message });
 
@@ -36,5 +40,12 @@ export const getAllUsers = (page = 1, pageSize = 20) =>
 export const deleteUser = (userId) => api.delete(`/admin/users/${userId}`);
 export const getAllLogs = (page = 1, pageSize = 20) => 
   api.get(`/admin/logs?page=${page}&page_size=${pageSize}`);
+export const openAdminFeed = (resumeAfter) => {
+  const params = new URLSearchParams({ token: localStorage.getItem('token') || '' });
+  if (resumeAfter) params.set('resume_after', resumeAfter);
+  return new WebSocket(`${API_URL.replace(/^http/, 'ws')}/admin/feed?${params}`);
+};
+export const getAnalytics = (start, end) =>
+  api.get('/admin/analytics', { params: { start, end } });
 
 export default api;
\ No newline at end of file